@@ -0,0 +1,123 @@
+"""Pricing of cart items, shared by the cart view and checkout."""
+from boutique.v1 import demo_pb2
+from currencyconverter.converter import convert_prices, shared_converter
+from currencyconverter.rates import NANOS_CONVERSION
+from logger import metrics
+from productcatalog import routing
+from reboot.aio.contexts import (
+    ReaderContext,
+    TransactionContext,
+    WorkflowContext,
+    WriterContext,
+)
+from typing import Sequence
+
+
+def money_from_nanos(currency_code: str, total_nanos: int) -> demo_pb2.Money:
+    """Returns `total_nanos` nano units of `currency_code` as `Money`."""
+    units, nanos = divmod(abs(total_nanos), NANOS_CONVERSION)
+    # Units and nanos must have the same sign.
+    if total_nanos < 0:
+        units, nanos = -units, -nanos
+    return demo_pb2.Money(
+        currency_code=currency_code,
+        units=units,
+        nanos=nanos,
+    )
+
+
+def money_to_nanos(money: demo_pb2.Money) -> int:
+    return money.units * NANOS_CONVERSION + money.nanos
+
+
+async def price_items(
+    context: ReaderContext | WriterContext | TransactionContext |
+    WorkflowContext,
+    items: Sequence[demo_pb2.CartItem],
+    currency_code: str,
+    *,
+    catalog_version: str = '',
+    prices_only: bool = False,
+) -> demo_pb2.GetPricedCartResponse:
+    """Prices each of `items` in `currency_code`, using the prices of
+    `catalog_version` of the catalog (the current version if empty),
+    along with the total for all of the items.
+
+    Prices are looked up in the catalog's price snapshots, in one call
+    per catalog shard, and converted in one pass, in process. Unless
+    `prices_only`, the products themselves are looked up too.
+
+    Raises `ValueError` if `currency_code` is not supported.
+    """
+    response = demo_pb2.GetPricedCartResponse(
+        total=demo_pb2.Money(currency_code=currency_code),
+        catalog_version=catalog_version,
+    )
+
+    if len(items) == 0:
+        return response
+
+    ids = [item.product_id for item in items]
+
+    with metrics.timer('price_items/get_prices'):
+        get_prices_response = await routing.get_prices(
+            context,
+            ids=ids,
+            version=catalog_version,
+        )
+    response.catalog_version = get_prices_response.version
+    response.not_found_ids.extend(get_prices_response.not_found_ids)
+
+    products_by_id: dict[str, demo_pb2.Product] = {}
+    if not prices_only:
+        with metrics.timer('price_items/get_products'):
+            get_products_response = await routing.get_products(
+                context,
+                ids=[
+                    product_price.id
+                    for product_price in get_prices_response.prices
+                ],
+            )
+        products_by_id = {
+            product.id: product for product in get_products_response.products
+        }
+
+    with metrics.timer('price_items/convert'):
+        prices = convert_prices(
+            await shared_converter().current_rate_table(),
+            (
+                product_price.price
+                for product_price in get_prices_response.prices
+            ),
+            currency_code,
+        )
+    prices_by_id = {
+        product_price.id: price for product_price, price in
+        zip(get_prices_response.prices, prices)
+    }
+
+    total_nanos = 0
+    for item in items:
+        price = prices_by_id.get(item.product_id)
+        if price is None:
+            continue
+
+        line_total_nanos = money_to_nanos(price) * item.quantity
+        total_nanos += line_total_nanos
+
+        priced_item = response.items.add(
+            item=item,
+            unit_price=price,
+            line_total=money_from_nanos(currency_code, line_total_nanos),
+        )
+
+        # The product may have been removed from the catalog since the
+        # requested version.
+        product = products_by_id.get(item.product_id)
+        if product is not None:
+            priced_item.product.CopyFrom(product)
+            priced_item.product.price.CopyFrom(price)
+
+    response.total.CopyFrom(money_from_nanos(currency_code, total_nanos))
+
+    return response
@@ -1,38 +1,109 @@
 import time
 from boutique.v1 import demo_pb2
 from boutique.v1.demo_rbt import Cart
+from cart.pricing import price_items
+from logger import instrumented, metrics
+from rbt.v1alpha1.errors_pb2 import InvalidArgument
 from reboot.aio.auth.authorizers import allow
 from reboot.aio.contexts import ReaderContext, WriterContext
 
 
+def _items(state: demo_pb2.Cart) -> list[demo_pb2.CartItem]:
+    """Returns the items in the cart, in the order they were added."""
+    if len(state.items) > 0:
+        # Not yet migrated; see `_migrate()`.
+        return list(state.items)
+    return [
+        line.item
+        for line in sorted(state.lines.values(), key=lambda line: line.number)
+    ]
+
+
+@instrumented
 class CartServicer(Cart.Servicer):
 
     def authorizer(self):
         return allow()
 
+    def _migrate(self) -> None:
+        """Moves the items of a cart written before carts were keyed by
+        product ID into `lines`."""
+        if len(self.state.items) == 0:
+            return
+        items = list(self.state.items)
+        del self.state.items[:]
+        for item in items:
+            self._add(item)
+
+    def _add(self, item: demo_pb2.CartItem) -> None:
+        # If the item was already in the cart, increase the count instead of
+        # adding it again.
+        if item.product_id in self.state.lines:
+            previous_item = self.state.lines[item.product_id].item
+            previous_item.quantity += item.quantity
+            previous_item.added_at = item.added_at
+        else:
+            line = self.state.lines[item.product_id]
+            line.item.CopyFrom(item)
+            line.number = self.state.next_line_number
+            self.state.next_line_number += 1
+            metrics.record_size('Cart.lines', len(self.state.lines))
+
     async def add_item(
         self,
         context: WriterContext,
         request: demo_pb2.AddItemRequest,
     ) -> demo_pb2.Empty:
+        self._migrate()
+
+        request.item.added_at = int(time.time())
+        self._add(request.item)
+
+        return demo_pb2.Empty()
+
+    async def add_items(
+        self,
+        context: WriterContext,
+        request: demo_pb2.AddItemsRequest,
+    ) -> demo_pb2.Empty:
+        self._migrate()
 
         now = int(time.time())
+        for item in request.items:
+            item.added_at = now
+            self._add(item)
 
-        # If the item was already in the cart, increase the count instead of
-        # adding it again.
-        previous_item = next(
-            (
-                item for item in self.state.items
-                if item.product_id == request.item.product_id
-            ),
-            None,
-        )
-        if previous_item is not None:
-            previous_item.quantity += request.item.quantity
-            previous_item.added_at = now
+        return demo_pb2.Empty()
+
+    async def update_item(
+        self,
+        context: WriterContext,
+        request: demo_pb2.UpdateItemRequest,
+    ) -> demo_pb2.Empty:
+        self._migrate()
+
+        if request.item.quantity <= 0:
+            if request.item.product_id in self.state.lines:
+                del self.state.lines[request.item.product_id]
+        elif request.item.product_id in self.state.lines:
+            item = self.state.lines[request.item.product_id].item
+            item.quantity = request.item.quantity
+            item.added_at = int(time.time())
         else:
-            request.item.added_at = now
-            self.state.items.append(request.item)
+            request.item.added_at = int(time.time())
+            self._add(request.item)
+
+        return demo_pb2.Empty()
+
+    async def remove_item(
+        self,
+        context: WriterContext,
+        request: demo_pb2.RemoveItemRequest,
+    ) -> demo_pb2.Empty:
+        self._migrate()
+
+        if request.product_id in self.state.lines:
+            del self.state.lines[request.product_id]
 
         return demo_pb2.Empty()
 
@@ -41,7 +112,26 @@ class CartServicer(Cart.Servicer):
         context: ReaderContext,
         request: demo_pb2.GetItemsRequest,
     ) -> demo_pb2.GetItemsResponse:
-        return demo_pb2.GetItemsResponse(items=self.state.items)
+        return demo_pb2.GetItemsResponse(items=_items(self.state))
+
+    async def get_priced_cart(
+        self,
+        context: ReaderContext,
+        request: demo_pb2.GetPricedCartRequest,
+    ) -> demo_pb2.GetPricedCartResponse:
+        try:
+            return await price_items(
+                context,
+                _items(self.state),
+                request.currency_code,
+                catalog_version=request.catalog_version,
+                prices_only=request.prices_only,
+            )
+        except ValueError as error:
+            raise Cart.GetPricedCartAborted(
+                InvalidArgument(),
+                message=str(error),
+            )
 
     async def empty_cart(
         self,
@@ -49,4 +139,5 @@ class CartServicer(Cart.Servicer):
         request: demo_pb2.EmptyCartRequest,
     ) -> demo_pb2.Empty:
         del self.state.items[:]
+        self.state.lines.clear()
         return demo_pb2.Empty()
@@ -1,34 +1,19 @@
-import os
 import uuid
-from boutique.v1 import demo_pb2, demo_pb2_grpc
-from boutique.v1.demo_rbt import Cart, Checkout, ProductCatalog, Shipping
-from constants import PRODUCT_CATALOG_ACTOR_ID, SHIPPING_ACTOR_ID
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-from logger import logger
-from rbt.thirdparty.mailgun.v1.mailgun_rbt import Message
+from boutique.v1 import demo_pb2
+from boutique.v1.demo_rbt import Cart, Checkout, Mailer, OrderHistory, Shipping
+from logger import instrumented, logger, metrics
+from mailer.servicer import mailer_id
+from rbt.v1alpha1.errors_pb2 import InvalidArgument, NotFound
 from reboot.aio.auth.authorizers import allow
-from reboot.aio.call import Options
-from reboot.aio.contexts import (
-    ReaderContext,
-    TransactionContext,
-    WriterContext,
-)
-from reboot.thirdparty.mailgun import ENVVAR_MAILGUN_API_KEY
-from typing import Optional
+from reboot.aio.contexts import TransactionContext
 
 
+@instrumented
 class CheckoutServicer(Checkout.Servicer):
 
     def authorizer(self):
         return allow()
 
-    async def create(
-        self,
-        context: WriterContext,
-        request: demo_pb2.Empty,
-    ) -> demo_pb2.Empty:
-        return demo_pb2.Empty()
-
     async def place_order(
         self,
         context: TransactionContext,
@@ -37,102 +22,81 @@ class CheckoutServicer(Checkout.Servicer):
         # Get user cart.
         cart = Cart.ref(request.user_id)
 
-        get_items_response = await cart.get_items(context)
-
-        # For each item in the cart, verify that it is a real product, get its
-        # price, and convert the price to user currency.
-        product_catalog = ProductCatalog.ref(PRODUCT_CATALOG_ACTOR_ID)
-
-        # Convert to user currency.
-        order_items: list[demo_pb2.OrderItem] = []
-        async with context.legacy_grpc_channel() as channel:
-            stub = demo_pb2_grpc.CurrencyConverterStub(channel)
-            convert_response = await stub.Convert(
-                demo_pb2.CurrencyConversionRequest(
-                    products=[
-                        (
-                            await product_catalog.get_product(
-                                context,
-                                id=item.product_id,
-                            )
-                        ) for item in get_items_response.items
-                    ],
-                    to_code=request.user_currency,
+        # Get the price of every item in the cart, in the user's
+        # currency, verifying that each is a real product. Prices come
+        # from the version of the catalog that the user was shown, if
+        # given, so they don't change under the user's feet.
+        with metrics.timer('Checkout.place_order/price_cart'):
+            try:
+                priced_cart = await cart.get_priced_cart(
+                    context,
+                    currency_code=request.user_currency,
+                    catalog_version=request.catalog_version,
+                    prices_only=True,
                 )
+            except Cart.GetPricedCartAborted as aborted:
+                # E.g., the user's currency is not supported.
+                if isinstance(aborted.error, InvalidArgument):
+                    raise Checkout.PlaceOrderAborted(
+                        InvalidArgument(),
+                        message=aborted.message,
+                    )
+                raise
+
+        if len(priced_cart.not_found_ids) > 0:
+            raise Checkout.PlaceOrderAborted(
+                NotFound(),
+                message="No product found with ID(s) " + ', '.join(
+                    f"'{product_id}'"
+                    for product_id in priced_cart.not_found_ids
+                ),
             )
 
-            for item, product in zip(
-                get_items_response.items, convert_response.products
-            ):
-                order_items.append(
-                    demo_pb2.OrderItem(
-                        item=item,
-                        cost=product.price,
-                    )
-                )
+        order_items = [
+            demo_pb2.OrderItem(
+                item=priced_item.item,
+                cost=priced_item.unit_price,
+            ) for priced_item in priced_cart.items
+        ]
 
-        # TODO: Total up the price for the user.
         # TODO: Charge the user's credit card.
 
         # Prepare the shipping.
-        shipping = Shipping.ref(SHIPPING_ACTOR_ID)
-        await shipping.prepare_ship_order(
-            context,
-            quote=request.quote,
-        )
+        shipping = Shipping.ref(request.user_id)
+        with metrics.timer('Checkout.place_order/prepare_shipping'):
+            await shipping.prepare_ship_order(
+                context,
+                quote=request.quote,
+            )
 
         # Empty the user's cart.
-        await cart.empty_cart(context)
+        with metrics.timer('Checkout.place_order/empty_cart'):
+            await cart.empty_cart(context)
 
-        # Send a confirmation email to the user.
         order_id = str(uuid.uuid4())
         order_result = demo_pb2.OrderResult(
             order_id=order_id,
             shipping_cost=request.quote.cost,
             shipping_address=request.address,
             items=order_items,
+            items_cost=priced_cart.total,
         )
 
-        self.state.orders.append(order_result)
-
-        # Use a template in the 'templates' folder.
-        env = Environment(
-            loader=FileSystemLoader(
-                os.path.join(os.path.dirname(__file__), 'templates')
-            ),
-            autoescape=select_autoescape(['html', 'xml']),
-        )
-        template = env.get_template('thanks_for_listening_to_demo.html')
-
-        confirmation = template.render(order=order_result)
+        with metrics.timer('Checkout.place_order/add_order'):
+            await OrderHistory.ref(request.user_id).add_order(
+                context,
+                order=order_result,
+            )
 
-        if mailgun_api_key := await self._mailgun_api_key():
-            await Message.send(
+        # Queue a confirmation email to the user, to be sent in a batch
+        # along with those of other users' orders.
+        with metrics.timer('Checkout.place_order/queue_confirmation'):
+            await Mailer.ref(mailer_id(request.user_id)).queue_confirmation(
                 context,
-                Options(bearer_token=mailgun_api_key),
-                recipient=request.email,
-                sender='Reboot Team <team@reboot.dev>',
-                domain='reboot.dev',
-                subject='Thanks from the team at reboot.dev!',
-                html=confirmation,
+                email=request.email,
+                order=order_result,
             )
+
         logger.info(f"Order placed for '{request.email}'")
 
         return demo_pb2.PlaceOrderResponse(order=order_result)
-
-    async def orders(
-        self,
-        context: ReaderContext,
-        request: demo_pb2.OrdersRequest,
-    ) -> demo_pb2.OrdersResponse:
-        return demo_pb2.OrdersResponse(orders=reversed(self.state.orders))
-
-    async def _mailgun_api_key(self) -> Optional[str]:
-        api_key = os.environ.get(ENVVAR_MAILGUN_API_KEY)
-        if api_key is None:
-            logger.warning(
-                "The Mailgun API key secret is not set: "
-                "please see the README to enable sending "
-                "email."
-            )
-        return api_key
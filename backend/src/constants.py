@@ -1,4 +1,2 @@
 PRODUCT_CATALOG_ACTOR_ID = 'product-catalog'
-SHIPPING_ACTOR_ID = 'shipping'
 CURRENCY_CONVERTER_ACTOR_ID = 'currency-converter'
-CHECKOUT_ACTOR_ID = 'checkout'
@@ -0,0 +1,123 @@
+"""In-process currency conversion.
+
+The `CurrencyConverter` legacy gRPC service and everything else in the
+same process share one `CurrencyConverter` (see `shared_converter()`),
+so a conversion that happens on the backend, e.g., when pricing a cart,
+doesn't have to go through a gRPC channel to do what is a pure
+computation, and uses exactly the same rates as the service.
+"""
+import asyncio
+import os
+import time
+from boutique.v1 import demo_pb2
+from currencyconverter.rates import RateTable
+from logger import logger
+from typing import Iterable, Optional
+
+# Set this to read the rates from a file other than
+# `currency_conversions.json`.
+ENVVAR_CURRENCY_CONVERSIONS_PATH = 'CURRENCY_CONVERSIONS_PATH'
+
+# How often to check whether the rates file has changed, in seconds.
+RATES_CHECK_INTERVAL_SECONDS = 5.0
+
+
+class CurrencyConverter:
+    """The current conversion rates, as read from the rates file."""
+
+    def __init__(self):
+        self._path = os.environ.get(
+            ENVVAR_CURRENCY_CONVERSIONS_PATH,
+            os.path.join(
+                os.path.dirname(__file__), 'currency_conversions.json'
+            ),
+        )
+        self._file_stat = self._stat()
+        self.rate_table = RateTable.from_file(self._path)
+        self._next_check_time = (
+            time.monotonic() + RATES_CHECK_INTERVAL_SECONDS
+        )
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = os.stat(self._path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def current_rate_table(self) -> RateTable:
+        """Returns the current rate table, first replacing it if the
+        rates file has changed since it was read.
+
+        A table is never modified, so calls that are still using an old
+        table are unaffected when it is replaced.
+        """
+        now = time.monotonic()
+        if now >= self._next_check_time:
+            # Only one call at a time needs to check.
+            self._next_check_time = now + RATES_CHECK_INTERVAL_SECONDS
+
+            file_stat = self._stat()
+            if file_stat is not None and file_stat != self._file_stat:
+                self._file_stat = file_stat
+                try:
+                    rate_table = await asyncio.to_thread(
+                        RateTable.from_file,
+                        self._path,
+                    )
+                except Exception as exception:
+                    logger.error(
+                        f"Failed to reload currency rates from "
+                        f"'{self._path}', keeping the current rates: "
+                        f"{exception}"
+                    )
+                else:
+                    if rate_table.version != self.rate_table.version:
+                        self.rate_table = rate_table
+                        logger.info(
+                            f"Reloaded currency rates (version "
+                            f"{rate_table.version})"
+                        )
+
+        return self.rate_table
+
+
+_shared_converter: Optional[CurrencyConverter] = None
+
+
+def shared_converter() -> CurrencyConverter:
+    """Returns the converter shared by everything in this process,
+    creating it on first use."""
+    global _shared_converter
+    if _shared_converter is None:
+        _shared_converter = CurrencyConverter()
+    return _shared_converter
+
+
+def convert_prices(
+    rate_table: RateTable,
+    prices: Iterable[demo_pb2.Money],
+    to_code: str,
+) -> list[demo_pb2.Money]:
+    """Converts each of `prices` to `to_code`, in one pass.
+
+    Raises `ValueError` if any of the currencies is not supported.
+    """
+    convert = rate_table.convert
+    try:
+        return [
+            demo_pb2.Money(
+                currency_code=to_code,
+                units=units,
+                nanos=nanos,
+            ) for units, nanos in (
+                convert(
+                    price.units,
+                    price.nanos,
+                    price.currency_code,
+                    to_code,
+                ) for price in prices
+            )
+        ]
+    except KeyError as error:
+        raise ValueError(f"Unsupported currency {error}") from None
@@ -0,0 +1,97 @@
+"""Exact conversion of amounts of money between currencies."""
+import functools
+import hashlib
+import json
+from fractions import Fraction
+from typing import Mapping, Union
+
+NANOS_CONVERSION = 1000000000
+
+# How many distinct conversions each rate table remembers.
+CONVERSION_CACHE_SIZE = 64 * 1024
+
+
+class RateTable:
+    """An immutable table of the conversion rates between currencies.
+
+    Rates are kept as exact fractions and a converted amount is only
+    rounded once, to the nearest nano (ties to even), so conversions
+    don't accumulate floating point error.
+
+    Each table caches the conversions that it has done. Because a table
+    never changes, replacing it with a new one (e.g., after reloading
+    the rates) is all that it takes to invalidate that cache.
+    """
+
+    def __init__(
+        self,
+        conversions_from_euro: Mapping[str, Union[str, int]],
+        *,
+        version: str = '',
+    ):
+        # Identifies these rates, e.g., for clients that cache them.
+        self.version = version
+
+        # Go through `str` so that a rate like "1.1305" is exactly
+        # 11305/10000, whether it was written as a string or a number.
+        self.conversions_from_euro: dict[str, Fraction] = {
+            code: Fraction(str(value))
+            for code, value in conversions_from_euro.items()
+        }
+
+        # The rate to convert from one currency to another, for every
+        # pair of supported currencies, as `rates[to_code][from_code]`.
+        self.rates: dict[str, dict[str, Fraction]] = {
+            to_code:
+                {
+                    from_code: to_conversion / from_conversion
+                    for from_code, from_conversion in
+                    self.conversions_from_euro.items()
+                } for to_code, to_conversion in
+            self.conversions_from_euro.items()
+        }
+
+        self.convert = functools.lru_cache(maxsize=CONVERSION_CACHE_SIZE)(
+            self._convert
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> 'RateTable':
+        """Reads a table from a JSON file mapping each currency code to
+        its conversion rate from euros, versioned by a hash of the
+        file."""
+        with open(path, 'rb') as file:
+            data = file.read()
+        return cls(
+            json.loads(data),
+            version=hashlib.sha256(data).hexdigest(),
+        )
+
+    @property
+    def currency_codes(self) -> list[str]:
+        return list(self.conversions_from_euro)
+
+    def _convert(
+        self,
+        units: int,
+        nanos: int,
+        from_code: str,
+        to_code: str,
+    ) -> tuple[int, int]:
+        """Converts an amount of `units` and `nanos` in `from_code` to
+        `to_code`, returning the converted `(units, nanos)`.
+
+        Raises `KeyError` if either currency is not supported.
+        """
+        total_nanos = round(
+            (units * NANOS_CONVERSION + nanos) *
+            self.rates[to_code][from_code]
+        )
+
+        # Units and nanos must have the same sign.
+        converted_units, converted_nanos = divmod(
+            abs(total_nanos), NANOS_CONVERSION
+        )
+        if total_nanos < 0:
+            return -converted_units, -converted_nanos
+        return converted_units, converted_nanos
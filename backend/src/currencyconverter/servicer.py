@@ -1,23 +1,20 @@
 import grpc
-import json
-import os
 from boutique.v1 import demo_pb2, demo_pb2_grpc
+from currencyconverter.converter import (
+    CurrencyConverter,
+    convert_prices,
+    shared_converter,
+)
+from logger import instrumented
 from reboot.aio.auth.authorizers import allow
-
-NANOS_CONVERSION = 1000000000
+from typing import Optional
 
 
+@instrumented
 class CurrencyConverterServicer(demo_pb2_grpc.CurrencyConverterServicer):
 
-    def __init__(self):
-        self.conversions_from_euro: dict[str, float] = {}
-        with open(
-            os.path.join(
-                os.path.dirname(__file__), 'currency_conversions.json'
-            ), 'r'
-        ) as file:
-            for key, value in json.load(file).items():
-                self.conversions_from_euro[key] = float(value)
+    def __init__(self, converter: Optional[CurrencyConverter] = None):
+        self._converter = converter or shared_converter()
 
     def authorizer(self):
         return allow()
@@ -25,40 +22,35 @@ class CurrencyConverterServicer(demo_pb2_grpc.CurrencyConverterServicer):
     async def GetSupportedCurrencies(
         self, request: demo_pb2.Empty, context: grpc.ServicerContext
     ) -> demo_pb2.GetSupportedCurrenciesResponse:
+        rate_table = await self._converter.current_rate_table()
         return demo_pb2.GetSupportedCurrenciesResponse(
-            currency_codes=self.conversions_from_euro.keys()
+            currency_codes=rate_table.currency_codes,
+            rates_version=rate_table.version,
         )
 
     async def Convert(
         self, request: demo_pb2.CurrencyConversionRequest,
         context: grpc.ServicerContext
     ) -> demo_pb2.CurrencyConversionResponse:
-        response_products = []
-        for product in request.products:
-            original_amount_total_nanos = (
-                product.price.units * NANOS_CONVERSION
-            ) + product.price.nanos
+        rate_table = await self._converter.current_rate_table()
 
-            from_conversion = self.conversions_from_euro[
-                product.price.currency_code]
-            to_conversion = self.conversions_from_euro[request.to_code]
+        prices = convert_prices(
+            rate_table,
+            (product.price for product in request.products),
+            request.to_code,
+        )
 
-            total_nanos_converted = (
-                original_amount_total_nanos * to_conversion / from_conversion
-            )
+        response = demo_pb2.CurrencyConversionResponse(
+            rates_version=rate_table.version,
+        )
 
-            response_products.append(
-                demo_pb2.Product(
-                    id=product.id,
-                    name=product.name,
-                    description=product.description,
-                    picture=product.picture,
-                    price=demo_pb2.Money(
-                        currency_code=request.to_code,
-                        units=int(total_nanos_converted / NANOS_CONVERSION),
-                        nanos=int(total_nanos_converted % NANOS_CONVERSION)
-                    ),
-                )
-            )
+        if request.prices_only:
+            for product, price in zip(request.products, prices):
+                response.prices.add(id=product.id, price=price)
+        else:
+            for product, price in zip(request.products, prices):
+                converted_product = response.products.add()
+                converted_product.CopyFrom(product)
+                converted_product.price.CopyFrom(price)
 
-        return demo_pb2.CurrencyConversionResponse(products=response_products)
+        return response
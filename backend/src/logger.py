@@ -1,5 +1,12 @@
+import contextlib
+import functools
+import inspect
+import json
 import logging
+import os
+import time
 from log.log import formatter
+from typing import Any, Callable, ContextManager, Iterator, TypeVar
 
 stream_handler = logging.StreamHandler()
 stream_handler.setFormatter(formatter)
@@ -7,3 +14,167 @@ stream_handler.setFormatter(formatter)
 logger = logging.getLogger('demo')
 logger.addHandler(stream_handler)
 logger.setLevel(logging.INFO)
+
+# Set this (to anything but "0") to record how long servicer methods,
+# and phases within them, take and how large states grow, and to log
+# those metrics periodically.
+ENVVAR_METRICS = 'DEMO_METRICS'
+
+# Set this to also write the metrics, in the Prometheus text format, to
+# this file whenever they are logged, e.g., for the node exporter's
+# textfile collector.
+ENVVAR_METRICS_PROMETHEUS_PATH = 'DEMO_METRICS_PROMETHEUS_PATH'
+
+# How often to log metrics, in seconds.
+METRICS_LOG_INTERVAL_SECONDS = 60.0
+
+# Make sure that every metric name is a valid Prometheus label value.
+_PROMETHEUS_ESCAPES = str.maketrans({'\\': r'\\', '"': r'\"', '\n': r'\n'})
+
+
+class _Timing:
+    __slots__ = ('count', 'total_seconds', 'max_seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class Metrics:
+    """Timings of servicer methods (and phases within them) and sizes of
+    state fields, named like `Checkout.place_order`,
+    `Checkout.place_order/price_cart` or `OrderHistory.orders`.
+
+    When metrics are disabled, timing a phase or recording a size does
+    nothing but check `enabled`, and `instrumented()` leaves classes
+    untouched.
+    """
+
+    def __init__(self, *, enabled: bool):
+        self.enabled = enabled
+        self.timings: dict[str, _Timing] = {}
+        # The largest size seen for each state field.
+        self.max_sizes: dict[str, int] = {}
+        self._next_log_time = time.monotonic() + METRICS_LOG_INTERVAL_SECONDS
+
+    def record_time(self, name: str, seconds: float) -> None:
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = _Timing()
+        timing.count += 1
+        timing.total_seconds += seconds
+        timing.max_seconds = max(timing.max_seconds, seconds)
+        self._maybe_log()
+
+    def timer(self, name: str) -> ContextManager[None]:
+        """Returns a context manager that records how long its body
+        takes as `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(name)
+
+    @contextlib.contextmanager
+    def _timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(name, time.perf_counter() - start)
+
+    def record_size(self, name: str, size: int) -> None:
+        if not self.enabled:
+            return
+        if size > self.max_sizes.get(name, -1):
+            self.max_sizes[name] = size
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            'timings':
+                {
+                    name: {
+                        'count': timing.count,
+                        'total_seconds': timing.total_seconds,
+                        'max_seconds': timing.max_seconds,
+                    } for name, timing in self.timings.items()
+                },
+            'max_sizes': dict(self.max_sizes),
+        }
+
+    def prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text format."""
+        lines = [
+            '# TYPE demo_duration_seconds summary',
+        ]
+        for name, timing in self.timings.items():
+            label = f'{{name="{name.translate(_PROMETHEUS_ESCAPES)}"}}'
+            lines.append(f'demo_duration_seconds_count{label} {timing.count}')
+            lines.append(
+                f'demo_duration_seconds_sum{label} {timing.total_seconds}'
+            )
+        lines.append('# TYPE demo_duration_max_seconds gauge')
+        for name, timing in self.timings.items():
+            label = f'{{name="{name.translate(_PROMETHEUS_ESCAPES)}"}}'
+            lines.append(
+                f'demo_duration_max_seconds{label} {timing.max_seconds}'
+            )
+        lines.append('# TYPE demo_state_size_max gauge')
+        for name, size in self.max_sizes.items():
+            label = f'{{name="{name.translate(_PROMETHEUS_ESCAPES)}"}}'
+            lines.append(f'demo_state_size_max{label} {size}')
+        return '\n'.join(lines) + '\n'
+
+    def _maybe_log(self) -> None:
+        now = time.monotonic()
+        if now < self._next_log_time:
+            return
+        self._next_log_time = now + METRICS_LOG_INTERVAL_SECONDS
+
+        logger.info(f"Metrics: {json.dumps(self.snapshot(), sort_keys=True)}")
+
+        path = os.environ.get(ENVVAR_METRICS_PROMETHEUS_PATH)
+        if path is not None:
+            # Write and then rename so that a reader never sees a
+            # partially written file.
+            try:
+                with open(path + '.tmp', 'w') as file:
+                    file.write(self.prometheus())
+                os.replace(path + '.tmp', path)
+            except OSError as error:
+                logger.warning(f"Failed to write metrics to '{path}': {error}")
+
+
+_NULL_TIMER: ContextManager[None] = contextlib.nullcontext()
+
+metrics = Metrics(enabled=os.environ.get(ENVVAR_METRICS, '0') != '0')
+
+ClassT = TypeVar('ClassT', bound=type)
+
+
+def instrumented(cls: ClassT) -> ClassT:
+    """Records the time taken by every public async method of the
+    servicer `cls`, as `<name>.<method>` where `<name>` is the name of
+    the class without its `Servicer` suffix."""
+    if not metrics.enabled:
+        return cls
+
+    prefix = cls.__name__.removesuffix('Servicer')
+    for name, method in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.iscoroutinefunction(method):
+            continue
+        setattr(cls, name, _timed(f'{prefix}.{name}', method))
+
+    return cls
+
+
+def _timed(name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+
+    @functools.wraps(method)
+    async def timed(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            metrics.record_time(name, time.perf_counter() - start)
+
+    return timed
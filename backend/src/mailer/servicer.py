@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import os
+import zlib
+from boutique.v1 import demo_pb2
+from boutique.v1.demo_rbt import Mailer
+from datetime import timedelta
+from logger import instrumented, logger, metrics
+from rbt.thirdparty.mailgun.v1.mailgun_rbt import Message
+from reboot.aio.auth.authorizers import allow
+from reboot.aio.call import Options
+from reboot.aio.contexts import TransactionContext, WriterContext
+from reboot.thirdparty.mailgun import ENVVAR_MAILGUN_API_KEY
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import jinja2
+
+CONFIRMATION_TEMPLATE = 'thanks_for_listening_to_demo.html'
+
+# How many `Mailer`s to spread confirmation emails over, so that orders
+# don't all contend for a single one; see `mailer_id()`.
+MAILER_COUNT = 4
+
+# Order confirmation emails are queued in a `Mailer`, along with those
+# of other users' orders, and then sent in batches of at most
+# `CONFIRMATION_BATCH_SIZE`, at most once every
+# `CONFIRMATION_BATCH_INTERVAL`, so that a burst of orders doesn't
+# become a burst of emails.
+CONFIRMATION_BATCH_SIZE = 20
+CONFIRMATION_BATCH_INTERVAL = timedelta(seconds=1)
+
+
+def mailer_id(user_id: str) -> str:
+    """Returns the ID of the `Mailer` that queues the confirmation emails
+    of `user_id`'s orders."""
+    index = zlib.crc32(user_id.encode()) % MAILER_COUNT
+    return f'mailer-{index}'
+
+
+@functools.cache
+def _templates() -> 'jinja2.Environment':
+    """Returns the environment to load email templates from.
+
+    Importing jinja2 and creating the environment are put off until the
+    first email is sent, so that they don't slow down starting up.
+    Templates are then loaded and compiled once, when first used, and
+    cached by the environment for the life of the process. We never
+    edit templates while running, so there's no need for the environment
+    to check whether they've changed every time we use them.
+    """
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+    return Environment(
+        loader=FileSystemLoader(
+            os.path.join(os.path.dirname(__file__), 'templates')
+        ),
+        autoescape=select_autoescape(['html', 'xml']),
+        auto_reload=False,
+    )
+
+
+@instrumented
+class MailerServicer(Mailer.Servicer):
+
+    def authorizer(self):
+        return allow()
+
+    async def queue_confirmation(
+        self,
+        context: WriterContext,
+        request: demo_pb2.QueueConfirmationRequest,
+    ) -> demo_pb2.QueueConfirmationResponse:
+        # Like shipping, we send emails from a task so that they only go
+        # out if the order's transaction commits, and so that they don't
+        # hold up the order.
+        self.state.pending_confirmations.add(
+            email=request.email,
+            order=request.order,
+        )
+        metrics.record_size(
+            'Mailer.pending_confirmations',
+            len(self.state.pending_confirmations),
+        )
+        if not self.state.send_confirmations_scheduled:
+            self.state.send_confirmations_scheduled = True
+            await self.ref().schedule(
+                when=CONFIRMATION_BATCH_INTERVAL,
+            ).send_confirmations(context)
+
+        return demo_pb2.QueueConfirmationResponse(
+            pending_confirmations=len(self.state.pending_confirmations),
+        )
+
+    async def send_confirmations(
+        self,
+        context: TransactionContext,
+        request: demo_pb2.Empty,
+    ) -> demo_pb2.Empty:
+        batch = self.state.pending_confirmations[:CONFIRMATION_BATCH_SIZE]
+
+        if mailgun_api_key := await self._mailgun_api_key():
+            with metrics.timer('Mailer.send_confirmations/render'):
+                template = _templates().get_template(CONFIRMATION_TEMPLATE)
+                htmls = [
+                    template.render(order=confirmation.order)
+                    for confirmation in batch
+                ]
+
+            with metrics.timer('Mailer.send_confirmations/send'):
+                await asyncio.gather(
+                    *(
+                        Message.send(
+                            context,
+                            Options(bearer_token=mailgun_api_key),
+                            recipient=confirmation.email,
+                            sender='Reboot Team <team@reboot.dev>',
+                            domain='reboot.dev',
+                            subject='Thanks from the team at reboot.dev!',
+                            html=html,
+                        ) for confirmation, html in zip(batch, htmls)
+                    )
+                )
+
+        del self.state.pending_confirmations[:len(batch)]
+
+        # Send the rest, if any, in the next batch.
+        if len(self.state.pending_confirmations) > 0:
+            await self.ref().schedule(
+                when=CONFIRMATION_BATCH_INTERVAL,
+            ).send_confirmations(context)
+        else:
+            self.state.send_confirmations_scheduled = False
+
+        return demo_pb2.Empty()
+
+    async def _mailgun_api_key(self) -> Optional[str]:
+        api_key = os.environ.get(ENVVAR_MAILGUN_API_KEY)
+        if api_key is None:
+            logger.warning(
+                "The Mailgun API key secret is not set: "
+                "please see the README to enable sending "
+                "email."
+            )
+        return api_key
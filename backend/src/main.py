@@ -1,19 +1,30 @@
 import asyncio
 import reboot.thirdparty.mailgun
-from boutique.v1.demo_rbt import Checkout, ProductCatalog
+from boutique.v1.demo_rbt import ProductCatalog
 from cart.servicer import CartServicer
 from checkout.servicer import CheckoutServicer
-from constants import CHECKOUT_ACTOR_ID, PRODUCT_CATALOG_ACTOR_ID
 from currencyconverter.servicer import CurrencyConverterServicer
+from mailer.servicer import MailerServicer
+from orderhistory.servicer import OrderHistoryServicer
+from productcatalog.routing import configured_shard_count, shard_id
 from productcatalog.servicer import ProductCatalogServicer
 from reboot.aio.applications import Application
 from shipping.servicer import ShippingServicer
 
 
 async def initialize(context):
-    await Checkout.create(context, CHECKOUT_ACTOR_ID)
-
-    await ProductCatalog.load_products(context, PRODUCT_CATALOG_ACTOR_ID)
+    # Load every shard of the catalog concurrently.
+    count = configured_shard_count()
+    await asyncio.gather(
+        *(
+            ProductCatalog.load_products(
+                context,
+                shard_id(index, count),
+                shard_index=index,
+                shard_count=count,
+            ) for index in range(count)
+        )
+    )
 
 
 async def main():
@@ -22,6 +33,8 @@ async def main():
             ProductCatalogServicer,
             CartServicer,
             CheckoutServicer,
+            OrderHistoryServicer,
+            MailerServicer,
             ShippingServicer,
         ] + reboot.thirdparty.mailgun.servicers(),
         legacy_grpc_servicers=[
@@ -0,0 +1,105 @@
+from boutique.v1 import demo_pb2
+from boutique.v1.demo_rbt import OrderHistory
+from logger import instrumented, metrics
+from rbt.v1alpha1.errors_pb2 import InvalidArgument, StateNotConstructed
+from reboot.aio.auth.authorizers import allow
+from reboot.aio.contexts import (
+    ReaderContext,
+    TransactionContext,
+    WorkflowContext,
+    WriterContext,
+)
+from reboot.aio.external import ExternalContext
+from typing import Sequence
+
+# Page sizes for listing orders.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+def orders_page(
+    orders: Sequence[demo_pb2.OrderResult],
+    page_size: int,
+    page_token: str,
+) -> demo_pb2.OrdersResponse:
+    """Returns a page of `orders`, newest first.
+
+    `orders` must be oldest first. Page tokens are positions counted
+    from the first order, so they remain valid as orders are added.
+
+    Raises `ValueError` if `page_token` is invalid.
+    """
+    end = len(orders)
+    if page_token != '':
+        try:
+            end = int(page_token)
+        except ValueError:
+            end = -1
+        if end < 0 or end > len(orders):
+            raise ValueError(f"Invalid page token '{page_token}'")
+
+    if page_size <= 0:
+        page_size = DEFAULT_PAGE_SIZE
+
+    start = max(end - min(page_size, MAX_PAGE_SIZE), 0)
+
+    return demo_pb2.OrdersResponse(
+        orders=reversed(orders[start:end]),
+        next_page_token=str(start) if start > 0 else '',
+    )
+
+
+async def list_orders(
+    context: ReaderContext | WriterContext | TransactionContext |
+    WorkflowContext | ExternalContext,
+    user_id: str,
+    *,
+    page_size: int = 0,
+    page_token: str = '',
+) -> demo_pb2.OrdersResponse:
+    """Like `OrderHistory.list_orders()` on the history of `user_id`, but
+    returns an empty page for a user who has never placed an order, and
+    so has no `OrderHistory` yet."""
+    try:
+        return await OrderHistory.ref(user_id).list_orders(
+            context,
+            page_size=page_size,
+            page_token=page_token,
+        )
+    except OrderHistory.ListOrdersAborted as aborted:
+        if isinstance(aborted.error, StateNotConstructed):
+            return demo_pb2.OrdersResponse()
+        raise
+
+
+@instrumented
+class OrderHistoryServicer(OrderHistory.Servicer):
+
+    def authorizer(self):
+        return allow()
+
+    async def add_order(
+        self,
+        context: WriterContext,
+        request: demo_pb2.AddOrderRequest,
+    ) -> demo_pb2.Empty:
+        self.state.orders.append(request.order)
+        metrics.record_size('OrderHistory.orders', len(self.state.orders))
+        return demo_pb2.Empty()
+
+    async def list_orders(
+        self,
+        context: ReaderContext,
+        request: demo_pb2.OrdersRequest,
+    ) -> demo_pb2.OrdersResponse:
+        try:
+            return orders_page(
+                self.state.orders,
+                request.page_size,
+                request.page_token,
+            )
+        except ValueError as error:
+            raise OrderHistory.ListOrdersAborted(
+                InvalidArgument(),
+                message=str(error),
+            )
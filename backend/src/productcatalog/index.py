@@ -0,0 +1,128 @@
+import bisect
+import heapq
+import re
+from boutique.v1 import demo_pb2
+from collections import defaultdict
+from typing import Iterable, Optional
+
+# How much a match in each of a product's fields contributes to its
+# search score.
+NAME_WEIGHT = 3.0
+CATEGORY_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# How much less a query term that is only a prefix of a token counts
+# for than one that matches the whole token.
+PREFIX_MATCH_PENALTY = 0.5
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits `text` into lower case alphanumeric tokens."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class CatalogIndex:
+    """In-memory indexes derived from the products of a catalog.
+
+    An index is never persisted: it is (re)built from the catalog's
+    state whenever that state's `version` changes.
+    """
+
+    def __init__(self, version: str, products: Iterable[demo_pb2.Product]):
+        self.version = version
+        self.products: list[demo_pb2.Product] = list(products)
+        self.products_by_id: dict[str, demo_pb2.Product] = {
+            product.id: product for product in self.products
+        }
+
+        self.products_by_category: defaultdict[
+            str, list[demo_pb2.Product]] = defaultdict(list)
+        for product in self.products:
+            for category in product.categories:
+                self.products_by_category[category].append(product)
+
+        # Inverted index from token to the positions (in
+        # `self.products`) of the products containing that token,
+        # along with the score that token contributes for each.
+        postings: defaultdict[str, dict[int, float]] = defaultdict(dict)
+
+        for position, product in enumerate(self.products):
+            fields = [(product.name, NAME_WEIGHT)]
+            fields += [
+                (category, CATEGORY_WEIGHT) for category in product.categories
+            ]
+            fields += [(product.description, DESCRIPTION_WEIGHT)]
+            for text, weight in fields:
+                for token in tokenize(text):
+                    scores = postings[token]
+                    scores[position] = scores.get(position, 0.0) + weight
+
+        self._postings: dict[str, dict[int, float]] = dict(postings)
+
+        # All known tokens in sorted order so that we can find every
+        # token starting with a given prefix with a binary search.
+        self._tokens: list[str] = sorted(self._postings)
+
+    def search(
+        self,
+        query: str,
+        *,
+        limit: Optional[int] = None,
+    ) -> tuple[list[demo_pb2.Product], int]:
+        """Returns the (at most `limit`) best products that match every
+        term in `query`, best matches first, along with the total number
+        of matching products.
+
+        A term matches a product if it is equal to, or a prefix of, a
+        token in the product's name, categories or description.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if len(terms) == 0:
+            return [], 0
+
+        # Intersect starting from the term with the fewest matches so
+        # that we do as little work as possible.
+        term_scores = sorted(
+            (self._term_scores(term) for term in terms),
+            key=len,
+        )
+        scores = term_scores[0]
+        for other_scores in term_scores[1:]:
+            scores = {
+                position: score + other_scores[position]
+                for position, score in scores.items()
+                if position in other_scores
+            }
+
+        # Order by descending score, breaking ties by catalog order.
+        def key(position: int) -> tuple[float, int]:
+            return (-scores[position], position)
+
+        positions = (
+            sorted(scores, key=key) if limit is None else
+            heapq.nsmallest(limit, scores, key=key)
+        )
+
+        return [self.products[position] for position in positions], len(scores)
+
+    def _term_scores(self, term: str) -> dict[int, float]:
+        """Returns the score of every product that `term` matches.
+
+        The returned dictionary must not be modified.
+        """
+        start = end = bisect.bisect_left(self._tokens, term)
+        while end < len(self._tokens) and self._tokens[end].startswith(term):
+            end += 1
+
+        if end - start == 1 and self._tokens[start] == term:
+            # Just an exact match, the postings are already the scores.
+            return self._postings[term]
+
+        scores: dict[int, float] = {}
+        for token in self._tokens[start:end]:
+            weight = 1.0 if token == term else PREFIX_MATCH_PENALTY
+            for position, score in self._postings[token].items():
+                scores[position] = scores.get(position, 0.0) + weight * score
+        return scores
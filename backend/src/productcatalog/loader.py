@@ -0,0 +1,275 @@
+"""Incremental loading of product catalogs from files.
+
+A catalog file may be in one of these formats, determined by its
+extension:
+
+  * `.json`: a JSON `ProductCatalog`, i.e., `{"products": [...]}`.
+  * `.binpb`: a binary `ProductCatalog`.
+  * `.ldpb`: a sequence of binary `Product`s, each prefixed by its
+    length as a varint.
+
+JSON and length-delimited catalogs are read in chunks, one product at a
+time, so loading them takes little more memory than the catalog's
+state itself. A binary catalog is parsed in one go, which is the
+fastest option if memory isn't a concern.
+
+To convert a catalog between formats, run (from `backend/`):
+
+    PYTHONPATH=api python src/productcatalog/loader.py \
+        src/productcatalog/products.json products.ldpb
+"""
+import codecs
+import hashlib
+import json
+import os
+import sys
+from boutique.v1 import demo_pb2
+from google.protobuf.json_format import MessageToDict, ParseDict
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional
+
+# How much of a catalog file to read at a time.
+CHUNK_SIZE = 64 * 1024
+
+JSON_EXTENSION = '.json'
+BINARY_EXTENSION = '.binpb'
+LENGTH_DELIMITED_EXTENSION = '.ldpb'
+
+
+class _HashingReader:
+    """Reads a file in chunks, hashing everything that is read."""
+
+    def __init__(self, file: BinaryIO):
+        self._file = file
+        self.hash = hashlib.sha256()
+
+    def read(self) -> bytes:
+        chunk = self._file.read(CHUNK_SIZE)
+        self.hash.update(chunk)
+        return chunk
+
+
+def catalog_version(path: str) -> str:
+    """Returns the `version` that `load_catalog()` would give the
+    catalog file at `path`, without parsing it.
+
+    This blocks, so call it from a thread when in an event loop.
+    """
+    with open(path, 'rb') as file:
+        reader = _HashingReader(file)
+        while reader.read() != b'':
+            pass
+        return reader.hash.hexdigest()
+
+
+def load_catalog(
+    path: str,
+    catalog: demo_pb2.ProductCatalog,
+    *,
+    include: Optional[Callable[[demo_pb2.Product], bool]] = None,
+) -> None:
+    """Replaces the products of `catalog` with those from the catalog
+    file at `path` (only those for which `include` returns true, if
+    given), and sets `catalog.version` to a hash of the file.
+
+    This blocks, so call it from a thread when in an event loop.
+    """
+    extension = os.path.splitext(path)[1]
+
+    del catalog.products[:]
+
+    with open(path, 'rb') as file:
+        reader = _HashingReader(file)
+
+        if extension == BINARY_EXTENSION:
+            loaded = demo_pb2.ProductCatalog.FromString(
+                b''.join(iter(reader.read, b''))
+            )
+            if include is None:
+                catalog.products.extend(loaded.products)
+            else:
+                catalog.products.extend(
+                    product for product in loaded.products if include(product)
+                )
+        elif extension == LENGTH_DELIMITED_EXTENSION:
+            for data in _length_delimited_messages(reader):
+                product = catalog.products.add()
+                product.ParseFromString(data)
+                if include is not None and not include(product):
+                    del catalog.products[-1]
+        elif extension == JSON_EXTENSION:
+            for product_dict in _json_products(reader):
+                product = catalog.products.add()
+                ParseDict(product_dict, product)
+                if include is not None and not include(product):
+                    del catalog.products[-1]
+        else:
+            raise ValueError(
+                f"Unknown catalog format '{extension}' for '{path}'; "
+                f"expecting one of '{JSON_EXTENSION}', '{BINARY_EXTENSION}' "
+                f"or '{LENGTH_DELIMITED_EXTENSION}'"
+            )
+
+        # Make sure the whole file has been hashed, even if there was
+        # trailing content that we didn't need to parse.
+        while reader.read() != b'':
+            pass
+
+        catalog.version = reader.hash.hexdigest()
+
+
+def _length_delimited_messages(reader: _HashingReader) -> Iterator[bytes]:
+    buffer = b''
+    position = 0
+    eof = False
+
+    def ensure(size: int) -> bool:
+        """Makes sure that there are at least `size` unread bytes in the
+        buffer, returning false if the file ends before that."""
+        nonlocal buffer, position, eof
+        while len(buffer) - position < size and not eof:
+            chunk = reader.read()
+            eof = chunk == b''
+            buffer = buffer[position:] + chunk
+            position = 0
+        return len(buffer) - position >= size
+
+    while ensure(1):
+        # Decode the varint length prefix.
+        length = 0
+        shift = 0
+        while True:
+            if not ensure(1):
+                raise ValueError('Truncated length-delimited catalog')
+            byte = buffer[position]
+            position += 1
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if byte & 0x80 == 0:
+                break
+
+        if not ensure(length):
+            raise ValueError('Truncated length-delimited catalog')
+
+        yield buffer[position:position + length]
+        position += length
+
+
+def _json_products(reader: _HashingReader) -> Iterator[dict]:
+    """Yields the elements of the top-level "products" array of a JSON
+    catalog, one at a time, without decoding the whole document."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def read_more() -> None:
+        nonlocal buffer, position, eof
+        if eof:
+            raise ValueError('Truncated JSON catalog')
+        chunk = reader.read()
+        eof = chunk == b''
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=eof)
+        position = 0
+
+    def next_character() -> str:
+        """Skips whitespace and returns the next character, without
+        consuming it."""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            read_more()
+
+    def expect(character: str) -> None:
+        nonlocal position
+        if next_character() != character:
+            raise ValueError(
+                f"Invalid JSON catalog: expected '{character}' but found "
+                f"'{buffer[position]}'"
+            )
+        position += 1
+
+    def decode_value():
+        nonlocal position
+        next_character()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                # A value that runs right up to the end of the buffer
+                # might continue in the next chunk (e.g., a number).
+                if end < len(buffer) or eof:
+                    position = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+
+    expect('{')
+    if next_character() == '}':
+        return
+    while True:
+        key = decode_value()
+        expect(':')
+        if key == 'products':
+            expect('[')
+            if next_character() == ']':
+                position += 1
+            else:
+                while True:
+                    yield decode_value()
+                    if next_character() == ']':
+                        position += 1
+                        break
+                    expect(',')
+        else:
+            decode_value()
+        if next_character() == '}':
+            return
+        expect(',')
+
+
+def write_catalog(path: str, products: Iterable[demo_pb2.Product]) -> None:
+    """Writes `products` to a catalog file at `path` in the format that
+    its extension implies."""
+    extension = os.path.splitext(path)[1]
+
+    with open(path, 'wb') as file:
+        if extension == BINARY_EXTENSION:
+            file.write(
+                demo_pb2.ProductCatalog(products=products).SerializeToString()
+            )
+        elif extension == LENGTH_DELIMITED_EXTENSION:
+            for product in products:
+                data = product.SerializeToString()
+                length = len(data)
+                while length > 0x7F:
+                    file.write(bytes([(length & 0x7F) | 0x80]))
+                    length >>= 7
+                file.write(bytes([length]) + data)
+        elif extension == JSON_EXTENSION:
+            file.write(
+                json.dumps(
+                    {
+                        'products': [
+                            MessageToDict(product) for product in products
+                        ]
+                    },
+                    indent=2,
+                ).encode()
+            )
+        else:
+            raise ValueError(f"Unknown catalog format '{extension}'")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(f'usage: {sys.argv[0]} INPUT_CATALOG OUTPUT_CATALOG')
+        sys.exit(1)
+
+    catalog = demo_pb2.ProductCatalog()
+    load_catalog(sys.argv[1], catalog)
+    write_catalog(sys.argv[2], catalog.products)
@@ -0,0 +1,164 @@
+"""Routing of products to the `ProductCatalog` shard that holds them.
+
+The catalog can be partitioned by product ID across several
+`ProductCatalog` states ("shards") so that reads are spread across
+them. The number of shards is read from the `PRODUCT_CATALOG_SHARDS`
+environment variable; the web frontend must be built with the same
+value in `VITE_PRODUCT_CATALOG_SHARDS` (see `web/src/helpers.ts`, which
+implements the same routing).
+"""
+import asyncio
+import os
+from boutique.v1 import demo_pb2
+from boutique.v1.demo_rbt import ProductCatalog
+from constants import PRODUCT_CATALOG_ACTOR_ID
+from reboot.aio.contexts import (
+    ReaderContext,
+    TransactionContext,
+    WorkflowContext,
+    WriterContext,
+)
+from reboot.aio.external import ExternalContext
+from typing import Sequence
+
+ENVVAR_PRODUCT_CATALOG_SHARDS = 'PRODUCT_CATALOG_SHARDS'
+
+_FNV_OFFSET_BASIS = 0x811C9DC5
+_FNV_PRIME = 0x01000193
+
+
+def configured_shard_count() -> int:
+    """Returns the number of shards the catalog is partitioned into."""
+    return int(os.environ.get(ENVVAR_PRODUCT_CATALOG_SHARDS, '1'))
+
+
+def shard_index(product_id: str, shard_count: int) -> int:
+    """Returns which of `shard_count` shards `product_id` belongs to.
+
+    Uses (32 bit) FNV-1a, which is stable across processes (unlike
+    Python's `hash()`) and easy to implement identically in the web
+    frontend.
+    """
+    value = _FNV_OFFSET_BASIS
+    for byte in product_id.encode('utf-8'):
+        value = ((value ^ byte) * _FNV_PRIME) & 0xFFFFFFFF
+    return value % shard_count
+
+
+def shard_id(shard_index: int, shard_count: int) -> str:
+    """Returns the state ID of a shard of the catalog."""
+    # An unsharded catalog keeps its original ID.
+    if shard_count == 1:
+        return PRODUCT_CATALOG_ACTOR_ID
+    return f'{PRODUCT_CATALOG_ACTOR_ID}-{shard_index}'
+
+
+def _ids_by_shard(ids: Sequence[str], count: int) -> dict[int, list[str]]:
+    ids_by_shard: dict[int, list[str]] = {}
+    for product_id in ids:
+        ids_by_shard.setdefault(shard_index(product_id, count),
+                                []).append(product_id)
+    return ids_by_shard
+
+
+async def get_products(
+    context: ReaderContext | WriterContext | TransactionContext |
+    WorkflowContext | ExternalContext,
+    ids: Sequence[str],
+) -> demo_pb2.GetProductsResponse:
+    """Like `ProductCatalog.get_products()`, but looks up each product in
+    the shard that holds it, querying all shards concurrently."""
+    count = configured_shard_count()
+
+    responses = await asyncio.gather(
+        *(
+            ProductCatalog.ref(shard_id(index, count)).get_products(
+                context,
+                ids=shard_product_ids,
+            ) for index, shard_product_ids in _ids_by_shard(ids, count).items()
+        )
+    )
+
+    products_by_id: dict[str, demo_pb2.Product] = {}
+    not_found_ids: set[str] = set()
+    for response in responses:
+        products_by_id.update(
+            (product.id, product) for product in response.products
+        )
+        not_found_ids.update(response.not_found_ids)
+
+    # Return results in the order they were requested, like a single
+    # shard does.
+    return demo_pb2.GetProductsResponse(
+        products=[
+            products_by_id[product_id]
+            for product_id in ids
+            if product_id in products_by_id
+        ],
+        not_found_ids=[
+            product_id for product_id in ids if product_id in not_found_ids
+        ],
+    )
+
+
+async def get_prices(
+    context: ReaderContext | WriterContext | TransactionContext |
+    WorkflowContext | ExternalContext,
+    ids: Sequence[str],
+    version: str = '',
+) -> demo_pb2.GetPricesResponse:
+    """Like `ProductCatalog.get_prices()`, but looks up each price in the
+    shard that holds it, querying all shards concurrently.
+
+    Shards are loaded independently, so they may briefly disagree on
+    the current version of the catalog. If `version` is empty, it is
+    resolved by the first shard queried, and every other shard is then
+    asked for the prices of that same version."""
+    count = configured_shard_count()
+    ids_by_shard = list(_ids_by_shard(ids, count).items())
+
+    responses: list[demo_pb2.GetPricesResponse] = []
+    if version == '' and len(ids_by_shard) > 1:
+        index, shard_product_ids = ids_by_shard.pop(0)
+        responses.append(
+            await ProductCatalog.ref(shard_id(index, count)).get_prices(
+                context,
+                ids=shard_product_ids,
+            )
+        )
+        version = responses[0].version
+
+    responses.extend(
+        await asyncio.gather(
+            *(
+                ProductCatalog.ref(shard_id(index, count)).get_prices(
+                    context,
+                    ids=shard_product_ids,
+                    version=version,
+                ) for index, shard_product_ids in ids_by_shard
+            )
+        )
+    )
+
+    prices_by_id: dict[str, demo_pb2.Money] = {}
+    not_found_ids: set[str] = set()
+    for response in responses:
+        prices_by_id.update(
+            (product_price.id, product_price.price)
+            for product_price in response.prices
+        )
+        not_found_ids.update(response.not_found_ids)
+
+    return demo_pb2.GetPricesResponse(
+        prices=[
+            demo_pb2.ProductPrice(
+                id=product_id,
+                price=prices_by_id[product_id],
+            ) for product_id in ids
+            if product_id in prices_by_id
+        ],
+        not_found_ids=[
+            product_id for product_id in ids if product_id in not_found_ids
+        ],
+        version=responses[0].version if len(responses) > 0 else version,
+    )
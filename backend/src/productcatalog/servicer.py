@@ -1,54 +1,293 @@
-import json
+import asyncio
 import os
 from boutique.v1 import demo_pb2
 from boutique.v1.demo_rbt import ProductCatalog
-from google.protobuf.json_format import ParseDict
+from logger import instrumented, logger, metrics
+from productcatalog.index import CatalogIndex
+from productcatalog.loader import catalog_version, load_catalog
+from productcatalog.routing import shard_index
+from rbt.v1alpha1.errors_pb2 import InvalidArgument, NotFound
 from reboot.aio.auth.authorizers import allow
 from reboot.aio.contexts import ReaderContext, WriterContext
+from typing import Callable, Optional
 
+# Set this to load the catalog from a file other than `products.json`,
+# e.g., a binary catalog; see `loader.py` for supported formats.
+ENVVAR_PRODUCT_CATALOG_PATH = 'PRODUCT_CATALOG_PATH'
 
+# How many versions of the catalog to keep the prices of, so that
+# orders can still be priced as they were shown to the user for a while
+# after the catalog changes.
+MAX_PRICE_SNAPSHOTS = 3
+
+# Page sizes for methods that paginate their results.
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _page_bounds(page_size: int, page_token: str) -> tuple[int, int]:
+    """Returns the `[start, end)` bounds of the page of results that
+    `page_token` and `page_size` refer to.
+
+    Raises `ValueError` if `page_token` is invalid.
+    """
+    start = 0
+    if page_token != '':
+        try:
+            start = int(page_token)
+        except ValueError:
+            start = -1
+        if start < 0:
+            raise ValueError(f"Invalid page token '{page_token}'")
+
+    if page_size <= 0:
+        page_size = DEFAULT_PAGE_SIZE
+
+    return start, start + min(page_size, MAX_PAGE_SIZE)
+
+
+def _next_page_token(end: int, total_size: int) -> str:
+    """Returns the token for the page after one ending at `end`, or ''
+    if there are no more results."""
+    return str(end) if end < total_size else ''
+
+
+@instrumented
 class ProductCatalogServicer(ProductCatalog.Servicer):
 
+    def __init__(self):
+        super().__init__()
+        # Indexes derived from the state of each catalog (or shard of
+        # one) served by this servicer, by state ID; see `_index()`.
+        self._catalog_indexes: dict[str, CatalogIndex] = {}
+
     def authorizer(self):
         return allow()
 
+    def _index(self, context: ReaderContext) -> CatalogIndex:
+        # One servicer serves every `ProductCatalog` on this server,
+        # e.g., several shards, each with its own index. All shards of
+        # a catalog have the same version, so an index must be looked
+        # up by state ID, not just by version.
+        #
+        # The state may have been replaced (e.g., by `load_products`)
+        # since we last built its index, in which case its version will
+        # have changed and we must rebuild.
+        index = self._catalog_indexes.get(context.state_id)
+        if index is None or index.version != self.state.version:
+            index = CatalogIndex(self.state.version, self.state.products)
+            self._catalog_indexes[context.state_id] = index
+        return index
+
+    def _take_price_snapshot(self) -> None:
+        """Records the prices of the products as the price snapshot of
+        the current version, forgetting the oldest snapshots if there
+        are more than `MAX_PRICE_SNAPSHOTS`."""
+        version = self.state.version
+        if version in self.state.price_snapshots:
+            # Reloaded, e.g., as a different shard.
+            del self.state.price_snapshots[version]
+            self.state.price_snapshot_versions.remove(version)
+
+        snapshot = self.state.price_snapshots[version]
+        for product in self.state.products:
+            snapshot.prices[product.id].CopyFrom(product.price)
+        self.state.price_snapshot_versions.append(version)
+
+        while len(self.state.price_snapshot_versions) > MAX_PRICE_SNAPSHOTS:
+            del self.state.price_snapshots[
+                self.state.price_snapshot_versions[0]]
+            del self.state.price_snapshot_versions[0]
+
     async def load_products(
         self,
         context: WriterContext,
-        request: demo_pb2.Empty,
+        request: demo_pb2.LoadProductsRequest,
     ) -> demo_pb2.Empty:
-        with open(
-            os.path.join(os.path.dirname(__file__), 'products.json'), 'r'
-        ) as file:
-            self.state.CopyFrom(
-                ParseDict(json.load(file), ProductCatalog.State())
+        path = os.environ.get(
+            ENVVAR_PRODUCT_CATALOG_PATH,
+            os.path.join(os.path.dirname(__file__), 'products.json'),
+        )
+
+        # This is called every time the application starts, so don't
+        # bother reloading the same shard of the same catalog again.
+        # Just hashing the catalog is much faster than parsing it.
+        version = await asyncio.to_thread(catalog_version, path)
+        if (
+            version == self.state.version and
+            request.shard_index == self.state.shard_index and
+            request.shard_count == self.state.shard_count
+        ):
+            logger.info(
+                f"Product catalog '{context.state_id}' is already loaded "
+                f"(version {version})"
             )
+            # The catalog may have been loaded before we took price
+            # snapshots. Our indexes are built on the first read; see
+            # `_index()`.
+            if version not in self.state.price_snapshots:
+                self._take_price_snapshot()
+            return demo_pb2.Empty()
+
+        include: Optional[Callable[[demo_pb2.Product], bool]] = None
+        if request.shard_count > 1:
+            # Only load the products that belong to this shard.
+            def include(product: demo_pb2.Product) -> bool:
+                return shard_index(
+                    product.id,
+                    request.shard_count,
+                ) == request.shard_index
+
+        self.state.shard_index = request.shard_index
+        self.state.shard_count = request.shard_count
+
+        # Loading and indexing a large catalog takes a while, so do both
+        # in a thread to avoid blocking the event loop. Having just
+        # loaded the catalog, we build our indexes now rather than on
+        # the first read.
+        with metrics.timer('ProductCatalog.load_products/load'):
+            await asyncio.to_thread(
+                load_catalog,
+                path,
+                self.state,
+                include=include,
+            )
+        with metrics.timer('ProductCatalog.load_products/index'):
+            index = await asyncio.to_thread(
+                CatalogIndex,
+                self.state.version,
+                self.state.products,
+            )
+            self._catalog_indexes[context.state_id] = index
+
+        with metrics.timer('ProductCatalog.load_products/snapshot'):
+            await asyncio.to_thread(self._take_price_snapshot)
+
+        metrics.record_size(
+            'ProductCatalog.products',
+            len(self.state.products),
+        )
 
         return demo_pb2.Empty()
 
     async def list_products(
         self,
         context: ReaderContext,
-        request: demo_pb2.Empty,
+        request: demo_pb2.ListProductsRequest,
     ) -> demo_pb2.ListProductsResponse:
-        return demo_pb2.ListProductsResponse(products=self.state.products)
+        try:
+            start, end = _page_bounds(request.page_size, request.page_token)
+        except ValueError as error:
+            raise ProductCatalog.ListProductsAborted(
+                InvalidArgument(),
+                message=str(error),
+            )
+
+        index = self._index(context)
+        products = (
+            index.products_by_category.get(request.category, [])
+            if request.category != '' else index.products
+        )
+
+        page = products[start:end]
+
+        if request.HasField('read_mask'):
+            if not request.read_mask.IsValidForDescriptor(
+                demo_pb2.Product.DESCRIPTOR
+            ):
+                raise ProductCatalog.ListProductsAborted(
+                    InvalidArgument(),
+                    message=(
+                        "Invalid read mask "
+                        f"'{','.join(request.read_mask.paths)}'"
+                    ),
+                )
+            projected_page = []
+            for product in page:
+                projected_product = demo_pb2.Product()
+                request.read_mask.MergeMessage(product, projected_product)
+                projected_page.append(projected_product)
+            page = projected_page
+
+        return demo_pb2.ListProductsResponse(
+            products=page,
+            next_page_token=_next_page_token(end, len(products)),
+        )
 
     async def get_product(
         self,
         context: ReaderContext,
         request: demo_pb2.GetProductRequest,
     ) -> demo_pb2.Product:
-        for product in self.state.products:
-            if request.id == product.id:
-                return product
-        # TODO: get parity with original implementation by returning a
-        # status code NOT_FOUND + message instead of raising a
-        # ValueError.
-        raise ValueError(f"No product found with ID '{request.id}'")
+        product = self._index(context).products_by_id.get(request.id)
+        if product is None:
+            raise ProductCatalog.GetProductAborted(
+                NotFound(),
+                message=f"No product found with ID '{request.id}'",
+            )
+        return product
+
+    async def get_products(
+        self,
+        context: ReaderContext,
+        request: demo_pb2.GetProductsRequest,
+    ) -> demo_pb2.GetProductsResponse:
+        products_by_id = self._index(context).products_by_id
+
+        response = demo_pb2.GetProductsResponse()
+        for product_id in request.ids:
+            product = products_by_id.get(product_id)
+            if product is None:
+                response.not_found_ids.append(product_id)
+            else:
+                response.products.append(product)
+
+        return response
+
+    async def get_prices(
+        self,
+        context: ReaderContext,
+        request: demo_pb2.GetPricesRequest,
+    ) -> demo_pb2.GetPricesResponse:
+        version = request.version or self.state.version
+        snapshot = self.state.price_snapshots.get(version)
+        if snapshot is None:
+            raise ProductCatalog.GetPricesAborted(
+                demo_pb2.PriceSnapshotNotFound(),
+                message=f"No prices for catalog version '{version}'",
+            )
+
+        response = demo_pb2.GetPricesResponse(version=version)
+        for product_id in request.ids:
+            price = snapshot.prices.get(product_id)
+            if price is None:
+                response.not_found_ids.append(product_id)
+            else:
+                response.prices.add(id=product_id, price=price)
+
+        return response
 
     async def search_products(
         self,
         context: ReaderContext,
         request: demo_pb2.SearchProductsRequest,
     ) -> demo_pb2.SearchProductsResponse:
-        raise NotImplementedError
+        try:
+            start, end = _page_bounds(request.page_size, request.page_token)
+        except ValueError as error:
+            raise ProductCatalog.SearchProductsAborted(
+                InvalidArgument(),
+                message=str(error),
+            )
+
+        # Only rank as many matches as we need for this page.
+        matches, total_size = self._index(context).search(
+            request.query,
+            limit=end,
+        )
+
+        return demo_pb2.SearchProductsResponse(
+            results=matches[start:end],
+            next_page_token=_next_page_token(end, total_size),
+            total_size=total_size,
+        )
@@ -1,11 +1,71 @@
+import hashlib
+import time
 import uuid
 from boutique.v1 import demo_pb2
 from boutique.v1.demo_rbt import Shipping
 from datetime import timedelta
+from logger import instrumented, metrics
 from reboot.aio.auth.authorizers import allow
 from reboot.aio.contexts import ReaderContext, WriterContext
 
+# Rather than scheduling a task to expire each quote, quotes are
+# expired in batches by a single task for all of the quotes that expire
+# within the same `EXPIRE_QUOTES_INTERVAL`.
+EXPIRE_QUOTES_INTERVAL = timedelta(seconds=10)
 
+
+# An outstanding quote is given again for the same request, rather than
+# a new one, as long as more than this fraction of the requested
+# expiration time is left on it.
+QUOTE_REUSE_MIN_REMAINING = 0.5
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def quote_key(request: demo_pb2.GetQuoteRequest) -> str:
+    """Returns a key that is the same for any two requests that should
+    get the same quote: those for the same cart, address and quantities
+    of each product, regardless of the order of the items or when they
+    were added."""
+    quantities: dict[str, int] = {}
+    for item in request.items:
+        quantities[item.product_id] = (
+            quantities.get(item.product_id, 0) + item.quantity
+        )
+
+    normalized = demo_pb2.GetQuoteRequest(
+        cart_id=request.cart_id,
+        address=request.address,
+        items=[
+            demo_pb2.CartItem(product_id=product_id, quantity=quantity)
+            for product_id, quantity in sorted(quantities.items())
+        ],
+    )
+
+    return hashlib.sha256(
+        normalized.SerializeToString(deterministic=True)
+    ).hexdigest()
+
+
+def quote_reusable(
+    quote: demo_pb2.ShippingQuote,
+    quote_expiration_seconds: int,
+    now_ms: int,
+) -> bool:
+    """Returns whether `quote` can be given again, at `now_ms`, for a
+    request for a quote that expires in `quote_expiration_seconds`: it
+    must not have expired, and must have more than
+    `QUOTE_REUSE_MIN_REMAINING` of that time left."""
+    remaining_ms = quote.expires_at_ms - now_ms
+    min_remaining_ms = (
+        quote_expiration_seconds * 1000 * QUOTE_REUSE_MIN_REMAINING
+    )
+    return remaining_ms > 0 and remaining_ms > min_remaining_ms
+
+
+@instrumented
 class ShippingServicer(Shipping.Servicer):
 
     def authorizer(self):
@@ -16,6 +76,21 @@ class ShippingServicer(Shipping.Servicer):
         context: WriterContext,
         request: demo_pb2.GetQuoteRequest,
     ) -> demo_pb2.GetQuoteResponse:
+        now_ms = _now_ms()
+
+        # Give the same quote again if we can, e.g., if the user views
+        # their cart again without changing it.
+        key = quote_key(request)
+        quote_id = self.state.quote_ids_by_key.get(key)
+        if quote_id is not None and quote_id in self.state.quotes:
+            quote = self.state.quotes[quote_id]
+            if quote_reusable(
+                quote,
+                request.quote_expiration_seconds,
+                now_ms,
+            ):
+                return demo_pb2.GetQuoteResponse(quote=quote)
+
         quote = demo_pb2.ShippingQuote(
             id=str(uuid.uuid4()),
             cost=demo_pb2.Money(
@@ -23,16 +98,14 @@ class ShippingServicer(Shipping.Servicer):
                 units=8,
                 nanos=(99 * 10000000),
             ),
+            expires_at_ms=now_ms + request.quote_expiration_seconds * 1000,
         )
 
-        self.state.quotes.append(quote)
+        self.state.quotes[quote.id].CopyFrom(quote)
+        self.state.quote_ids_by_key[key] = quote.id
+        metrics.record_size('Shipping.quotes', len(self.state.quotes))
 
-        await self.ref().schedule(
-            when=timedelta(seconds=request.quote_expiration_seconds),
-        ).expire_quote(
-            context,
-            quote=quote,
-        )
+        await self._schedule_expire_quotes(context, quote, now_ms)
 
         return demo_pb2.GetQuoteResponse(quote=quote)
 
@@ -41,18 +114,19 @@ class ShippingServicer(Shipping.Servicer):
         context: WriterContext,
         request: demo_pb2.PrepareShipOrderRequest,
     ) -> demo_pb2.PrepareShipOrderResponse:
-        # Remove the quote, unless it is missing implying it has been
-        # expired, in which case we raise an error.
-        valid_quote = False
-        i = 0
-        while i < len(self.state.quotes):
-            if self.state.quotes[i].id == request.quote.id:
-                valid_quote = True
-                del self.state.quotes[i]
-                break
-            i += 1
-
-        if not valid_quote:
+        # Remove the quote, unless it is missing or has expired (but not
+        # yet been removed), in which case we raise an error.
+        quote = self.state.quotes.get(request.quote.id)
+        if quote is None:
+            raise Shipping.PrepareShipOrderAborted(
+                demo_pb2.ShippingQuoteInvalidOrExpired()
+            )
+
+        expired = quote.expires_at_ms <= _now_ms()
+
+        del self.state.quotes[request.quote.id]
+
+        if expired:
             raise Shipping.PrepareShipOrderAborted(
                 demo_pb2.ShippingQuoteInvalidOrExpired()
             )
@@ -65,21 +139,80 @@ class ShippingServicer(Shipping.Servicer):
 
         return demo_pb2.PrepareShipOrderResponse(tracking_id=str(uuid.uuid4()))
 
-    async def expire_quote(
+    async def expire_quotes(
         self,
         context: WriterContext,
-        request: demo_pb2.ExpireQuoteRequest,
+        request: demo_pb2.ExpireQuotesRequest,
     ) -> demo_pb2.Empty:
-        # Remove the quote.
-        quotes = [
-            quote for quote in self.state.quotes
-            if quote.id != request.quote.id
+        now_ms = _now_ms()
+
+        # Remove every expired quote in one go.
+        expired_ids = [
+            id for id, quote in self.state.quotes.items()
+            if quote.expires_at_ms <= now_ms
+        ]
+        for id in expired_ids:
+            del self.state.quotes[id]
+
+        # Along with any reuse entries for quotes that are gone.
+        stale_keys = [
+            key for key, quote_id in self.state.quote_ids_by_key.items()
+            if quote_id not in self.state.quotes
+        ]
+        for key in stale_keys:
+            del self.state.quote_ids_by_key[key]
+
+        # Forget about this task, along with any others that should
+        # have run by now.
+        expire_quotes_times_ms = [
+            expire_quotes_time_ms
+            for expire_quotes_time_ms in self.state.expire_quotes_times_ms
+            if expire_quotes_time_ms > now_ms and
+            expire_quotes_time_ms != request.time_ms
         ]
-        del self.state.quotes[:]
-        self.state.quotes.extend(quotes)
+        del self.state.expire_quotes_times_ms[:]
+        self.state.expire_quotes_times_ms.extend(expire_quotes_times_ms)
+
+        # In case we ran a little early, make sure that the quotes that
+        # are left will still be expired.
+        for quote in self.state.quotes.values():
+            await self._schedule_expire_quotes(context, quote, now_ms)
 
         return demo_pb2.Empty()
 
+    async def _schedule_expire_quotes(
+        self,
+        context: WriterContext,
+        quote: demo_pb2.ShippingQuote,
+        now_ms: int,
+    ) -> None:
+        """Makes sure that there is a task to expire `quote`."""
+        # Round up to the end of the interval that the quote expires in
+        # so that all of the quotes expiring in that interval share a
+        # task.
+        interval_ms = EXPIRE_QUOTES_INTERVAL // timedelta(milliseconds=1)
+        expire_quotes_time_ms = (
+            (quote.expires_at_ms + interval_ms - 1) // interval_ms *
+            interval_ms
+        )
+
+        if expire_quotes_time_ms in self.state.expire_quotes_times_ms:
+            return
+
+        self.state.expire_quotes_times_ms.append(expire_quotes_time_ms)
+        metrics.record_size(
+            'Shipping.expire_quotes_times_ms',
+            len(self.state.expire_quotes_times_ms),
+        )
+        await self.ref().schedule(
+            when=timedelta(
+                milliseconds=max(expire_quotes_time_ms - now_ms, 0)
+            ),
+        ).expire_quotes(
+            context,
+            time_ms=expire_quotes_time_ms,
+        )
+
     async def ship_order(
         self,
         context: ReaderContext,
@@ -0,0 +1,117 @@
+"""Benchmarks how checkout throughput scales with concurrent users.
+
+Each user repeatedly adds an item to their cart, gets a shipping quote
+and places an order, first through their own `Checkout` and then, for
+comparison, through a single `Checkout` shared by every user (which is
+how all checkouts used to be done).
+
+This is not run as part of the test suite; run it explicitly with:
+
+    pytest -s backend/tests/checkout_benchmark.py
+"""
+import asyncio
+import os
+import time
+import unittest
+from boutique.v1 import demo_pb2
+from boutique.v1.demo_rbt import Cart, Checkout, Shipping
+from cart.servicer import CartServicer
+from checkout.servicer import CheckoutServicer
+from currencyconverter.servicer import CurrencyConverterServicer
+from mailer.servicer import MailerServicer
+from main import initialize
+from orderhistory.servicer import OrderHistoryServicer
+from productcatalog.servicer import ProductCatalogServicer
+from reboot.aio.applications import Application
+from reboot.aio.tests import Reboot
+from reboot.thirdparty.mailgun.servicers import MockMessageServicer
+from shipping.servicer import ShippingServicer
+
+CONCURRENT_USERS = [1, 2, 4, 8, 16, 32]
+
+CHECKOUTS_PER_USER = 10
+
+SHARED_CHECKOUT_ID = 'shared-checkout'
+
+
+class CheckoutBenchmark(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        # Any arbitrary mailgun API key works for the `MockMessageServicer`.
+        os.environ["MAILGUN_API_KEY"] = 'S3CR3T!'
+
+        self.rbt = Reboot()
+        await self.rbt.start()
+        await self.rbt.up(
+            Application(
+                servicers=[
+                    ProductCatalogServicer,
+                    CartServicer,
+                    CheckoutServicer,
+                    OrderHistoryServicer,
+                    MailerServicer,
+                    ShippingServicer,
+                    MockMessageServicer,
+                ],
+                legacy_grpc_servicers=[CurrencyConverterServicer],
+            ),
+        )
+
+        await initialize(self.rbt.create_external_context(name='initialize'))
+
+    async def asyncTearDown(self) -> None:
+        await self.rbt.stop()
+
+    async def _checkouts_per_second(self, users: int, shared: bool) -> float:
+
+        async def user(user_id: str) -> None:
+            context = self.rbt.create_external_context(name=user_id)
+            checkout = Checkout.ref(SHARED_CHECKOUT_ID if shared else user_id)
+
+            for _ in range(CHECKOUTS_PER_USER):
+                await Cart.ref(user_id).add_item(
+                    context,
+                    item=demo_pb2.CartItem(
+                        product_id='OLJCESPC7Z',
+                        quantity=1,
+                    ),
+                )
+                get_quote_response = await Shipping.ref(user_id).get_quote(
+                    context,
+                    quote_expiration_seconds=60,
+                )
+                await checkout.place_order(
+                    context,
+                    user_id=user_id,
+                    user_currency='USD',
+                    email=f'{user_id}@example.com',
+                    quote=get_quote_response.quote,
+                )
+
+        mode = 'shared' if shared else 'own'
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(user(f'{mode}-{users}-{i}') for i in range(users))
+        )
+        elapsed = time.perf_counter() - start
+
+        return users * CHECKOUTS_PER_USER / elapsed
+
+    async def test_checkout_throughput(self) -> None:
+        print()
+        print(
+            f"{'users':>6} {'shared (checkouts/s)':>22} "
+            f"{'per user (checkouts/s)':>24} {'speedup':>8}"
+        )
+
+        for users in CONCURRENT_USERS:
+            shared = await self._checkouts_per_second(users, shared=True)
+            own = await self._checkouts_per_second(users, shared=False)
+            print(
+                f"{users:>6} {shared:>22.1f} {own:>24.1f} "
+                f"{own / shared:>8.2f}"
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,29 @@ import asyncio
 import os
 import unittest
 from boutique.v1 import demo_pb2, demo_pb2_grpc
-from boutique.v1.demo_rbt import Cart, Checkout, Shipping
+from boutique.v1.demo_rbt import (
+    Cart,
+    Checkout,
+    Mailer,
+    ProductCatalog,
+    Shipping,
+)
 from cart.servicer import CartServicer
 from checkout.servicer import CheckoutServicer
-from constants import CHECKOUT_ACTOR_ID, SHIPPING_ACTOR_ID
+from constants import PRODUCT_CATALOG_ACTOR_ID
 from currencyconverter.servicer import CurrencyConverterServicer
+from google.protobuf.field_mask_pb2 import FieldMask
+from mailer.servicer import MailerServicer, mailer_id
 from main import initialize
+from orderhistory.servicer import OrderHistoryServicer, list_orders
+from productcatalog import routing
+from productcatalog.routing import (
+    ENVVAR_PRODUCT_CATALOG_SHARDS,
+    shard_id,
+    shard_index,
+)
 from productcatalog.servicer import ProductCatalogServicer
+from rbt.v1alpha1.errors_pb2 import InvalidArgument, NotFound
 from reboot.aio.applications import Application
 from reboot.aio.tests import Reboot
 from reboot.aio.types import ServiceName
@@ -29,20 +45,22 @@ class TestCase(unittest.IsolatedAsyncioTestCase):
             ProductCatalogServicer,
             CartServicer,
             CheckoutServicer,
+            OrderHistoryServicer,
+            MailerServicer,
             ShippingServicer,
             MockMessageServicer,
         ]
 
         legacy_grpc_servicers: list[type] = [CurrencyConverterServicer]
 
-        await self.rbt.start()
-        revision = await self.rbt.up(
-            Application(
-                servicers=servicers,
-                legacy_grpc_servicers=legacy_grpc_servicers,
-            ),
+        self.application = Application(
+            servicers=servicers,
+            legacy_grpc_servicers=legacy_grpc_servicers,
         )
 
+        await self.rbt.start()
+        revision = await self.rbt.up(self.application)
+
         del revision
         self.context = self.rbt.create_external_context(
             name=f"test-{self.id()}"
@@ -66,14 +84,14 @@ class TestCase(unittest.IsolatedAsyncioTestCase):
         )
 
         # Get a shipping quote for that card in preparation for checkout.
-        shipping = Shipping.ref(SHIPPING_ACTOR_ID)
+        shipping = Shipping.ref('jonathan')
         get_quote_response = await shipping.get_quote(
             self.context,
             quote_expiration_seconds=30,
         )
 
         # Check out the order.
-        checkout = Checkout.ref(CHECKOUT_ACTOR_ID)
+        checkout = Checkout.ref('jonathan')
 
         place_order_response = await checkout.place_order(
             self.context,
@@ -97,6 +115,10 @@ class TestCase(unittest.IsolatedAsyncioTestCase):
         )
         self.assertEqual(order_item.cost, expected_item_cost)
         self.assertEqual(order_item.item.quantity, 42)
+        self.assertEqual(
+            place_order_response.order.items_cost,
+            demo_pb2.Money(currency_code='USD', units=839, nanos=580000000),
+        )
         expected_shipping_cost = demo_pb2.Money(
             currency_code='USD', units=8, nanos=(99 * 10000000)
         )
@@ -108,13 +130,20 @@ class TestCase(unittest.IsolatedAsyncioTestCase):
         get_items_response = await cart.get_items(self.context)
         self.assertEqual(len(get_items_response.items), 0)
 
-        # The order must have been registered.
-        orders_response = await checkout.orders(self.context)
-        self.assertEqual(len(orders_response.orders), 1)
+        # The order must have been registered in the user's order
+        # history.
+        orders_response = await list_orders(self.context, 'jonathan')
         self.assertEqual(
-            orders_response.orders[0].order_id,
-            place_order_response.order.order_id
+            [order.order_id for order in orders_response.orders],
+            [place_order_response.order.order_id],
         )
+        self.assertEqual(orders_response.next_page_token, '')
+
+    async def test_list_orders_without_orders(self) -> None:
+        """A user who has never placed an order has no orders."""
+        orders_response = await list_orders(self.context, 'nobody')
+        self.assertEqual(len(orders_response.orders), 0)
+        self.assertEqual(orders_response.next_page_token, '')
 
     async def test_checkout_quote_expired(self) -> None:
         """Check out a single item with an expired shipping quote, and see the
@@ -131,7 +160,7 @@ class TestCase(unittest.IsolatedAsyncioTestCase):
 
         # Get a shipping quote for that card in preparation for checkout.
         # Use an expiration time of 0 so that the quote will expire immediately.
-        shipping = Shipping.ref(SHIPPING_ACTOR_ID)
+        shipping = Shipping.ref('jonathan')
         get_quote_response = await shipping.get_quote(
             self.context,
             quote_expiration_seconds=0,
@@ -141,7 +170,7 @@ class TestCase(unittest.IsolatedAsyncioTestCase):
 
         # The quote should have expired and the order should not have
         # gone through.
-        checkout = Checkout.ref(CHECKOUT_ACTOR_ID)
+        checkout = Checkout.ref('jonathan')
 
         with self.assertRaises(Checkout.PlaceOrderAborted) as aborted:
             await checkout.place_order(
@@ -157,6 +186,542 @@ class TestCase(unittest.IsolatedAsyncioTestCase):
             demo_pb2.ShippingQuoteInvalidOrExpired
         )
 
+    async def test_checkout_product_not_found(self) -> None:
+        """Check out a cart with an item that isn't in the catalog, and
+        see the checkout fail with `NotFound`."""
+        cart = Cart.ref('jonathan')
+        await cart.add_item(
+            self.context,
+            item=demo_pb2.CartItem(product_id='NOSUCHTHING', quantity=1),
+        )
+
+        shipping = Shipping.ref('jonathan')
+        get_quote_response = await shipping.get_quote(
+            self.context,
+            quote_expiration_seconds=30,
+        )
+
+        checkout = Checkout.ref('jonathan')
+
+        with self.assertRaises(Checkout.PlaceOrderAborted) as aborted:
+            await checkout.place_order(
+                self.context,
+                user_id='jonathan',
+                user_currency='USD',
+                email='hi@reboot.dev',
+                quote=get_quote_response.quote,
+            )
+
+        self.assertEqual(type(aborted.exception.error), NotFound)
+
+        # The cart is left as it was.
+        get_items_response = await cart.get_items(self.context)
+        self.assertEqual(len(get_items_response.items), 1)
+
+    async def test_checkout_unsupported_currency(self) -> None:
+        """Price and check out a cart in a currency that isn't supported,
+        and see both fail with `InvalidArgument`."""
+        cart = Cart.ref('jonathan')
+        await cart.add_item(
+            self.context,
+            item=demo_pb2.CartItem(product_id='OLJCESPC7Z', quantity=1),
+        )
+
+        with self.assertRaises(Cart.GetPricedCartAborted) as cart_aborted:
+            await cart.get_priced_cart(self.context, currency_code='XYZ')
+
+        self.assertEqual(type(cart_aborted.exception.error), InvalidArgument)
+
+        shipping = Shipping.ref('jonathan')
+        get_quote_response = await shipping.get_quote(
+            self.context,
+            quote_expiration_seconds=30,
+        )
+
+        checkout = Checkout.ref('jonathan')
+
+        with self.assertRaises(Checkout.PlaceOrderAborted) as aborted:
+            await checkout.place_order(
+                self.context,
+                user_id='jonathan',
+                user_currency='XYZ',
+                email='hi@reboot.dev',
+                quote=get_quote_response.quote,
+            )
+
+        self.assertEqual(type(aborted.exception.error), InvalidArgument)
+
+    async def test_confirmations_batched_across_users(self) -> None:
+        """Confirmation emails for the orders of several users are queued
+        in the same `Mailer`, to be sent in one batch."""
+        user_ids = [f'user-{i}' for i in range(20)]
+        user_ids = [
+            user_id for user_id in user_ids
+            if mailer_id(user_id) == mailer_id(user_ids[0])
+        ][:3]
+        self.assertEqual(len(user_ids), 3)
+
+        mailer = Mailer.ref(mailer_id(user_ids[0]))
+        pending_confirmations = []
+        for user_id in user_ids:
+            response = await mailer.queue_confirmation(
+                self.context,
+                email=f'{user_id}@example.com',
+                order=demo_pb2.OrderResult(order_id=f'order-{user_id}'),
+            )
+            pending_confirmations.append(response.pending_confirmations)
+
+        self.assertEqual(pending_confirmations, [1, 2, 3])
+
+    async def test_add_items(self) -> None:
+        """Add several items at once, merging quantities like `add_item`."""
+        cart = Cart.ref('jonathan')
+        await cart.add_item(
+            self.context,
+            item=demo_pb2.CartItem(product_id='OLJCESPC7Z', quantity=1),
+        )
+
+        await cart.add_items(
+            self.context,
+            items=[
+                demo_pb2.CartItem(product_id='66VCHSJNUP', quantity=2),
+                demo_pb2.CartItem(product_id='OLJCESPC7Z', quantity=3),
+                demo_pb2.CartItem(product_id='66VCHSJNUP', quantity=1),
+            ],
+        )
+
+        get_items_response = await cart.get_items(self.context)
+        self.assertEqual(
+            [
+                (item.product_id, item.quantity)
+                for item in get_items_response.items
+            ],
+            [('OLJCESPC7Z', 4), ('66VCHSJNUP', 3)],
+        )
+
+    async def test_get_priced_cart(self) -> None:
+        """Price a cart, with line totals and a total."""
+        cart = Cart.ref('jonathan')
+        await cart.add_items(
+            self.context,
+            items=[
+                demo_pb2.CartItem(product_id='OLJCESPC7Z', quantity=2),
+                demo_pb2.CartItem(product_id='66VCHSJNUP', quantity=3),
+            ],
+        )
+
+        priced_cart = await cart.get_priced_cart(
+            self.context,
+            currency_code='USD',
+        )
+
+        self.assertEqual(
+            [
+                (
+                    priced_item.item.product_id,
+                    priced_item.product.id,
+                    priced_item.product.price,
+                    priced_item.line_total,
+                ) for priced_item in priced_cart.items
+            ],
+            [
+                (
+                    'OLJCESPC7Z',
+                    'OLJCESPC7Z',
+                    demo_pb2.Money(
+                        currency_code='USD', units=19, nanos=990000000
+                    ),
+                    demo_pb2.Money(
+                        currency_code='USD', units=39, nanos=980000000
+                    ),
+                ),
+                (
+                    '66VCHSJNUP',
+                    '66VCHSJNUP',
+                    demo_pb2.Money(
+                        currency_code='USD', units=18, nanos=990000000
+                    ),
+                    demo_pb2.Money(
+                        currency_code='USD', units=56, nanos=970000000
+                    ),
+                ),
+            ],
+        )
+        self.assertEqual(
+            priced_cart.total,
+            demo_pb2.Money(currency_code='USD', units=96, nanos=950000000),
+        )
+        self.assertEqual(len(priced_cart.not_found_ids), 0)
+
+        # Prices are converted to the requested currency.
+        priced_cart = await cart.get_priced_cart(
+            self.context,
+            currency_code='EUR',
+        )
+        self.assertEqual(
+            {priced_item.product.price.currency_code
+             for priced_item in priced_cart.items},
+            {'EUR'},
+        )
+        self.assertEqual(priced_cart.total.currency_code, 'EUR')
+
+        # Prices alone, from a particular version of the catalog.
+        get_prices_response = await routing.get_prices(
+            self.context,
+            ids=['OLJCESPC7Z'],
+        )
+        priced_cart = await cart.get_priced_cart(
+            self.context,
+            currency_code='USD',
+            catalog_version=get_prices_response.version,
+            prices_only=True,
+        )
+        self.assertEqual(
+            priced_cart.catalog_version,
+            get_prices_response.version,
+        )
+        self.assertEqual(
+            [
+                (priced_item.unit_price, priced_item.HasField('product'))
+                for priced_item in priced_cart.items
+            ],
+            [
+                (
+                    demo_pb2.Money(
+                        currency_code='USD', units=19, nanos=990000000
+                    ),
+                    False,
+                ),
+                (
+                    demo_pb2.Money(
+                        currency_code='USD', units=18, nanos=990000000
+                    ),
+                    False,
+                ),
+            ],
+        )
+
+    async def test_update_and_remove_items(self) -> None:
+        """Set the quantity of, and remove, single items in a cart."""
+        cart = Cart.ref('jonathan')
+        for product_id in ['OLJCESPC7Z', '66VCHSJNUP', '1YMWWN1N4O']:
+            await cart.add_item(
+                self.context,
+                item=demo_pb2.CartItem(product_id=product_id, quantity=1),
+            )
+
+        await cart.update_item(
+            self.context,
+            item=demo_pb2.CartItem(product_id='66VCHSJNUP', quantity=5),
+        )
+        await cart.remove_item(self.context, product_id='OLJCESPC7Z')
+
+        get_items_response = await cart.get_items(self.context)
+        self.assertEqual(
+            [
+                (item.product_id, item.quantity)
+                for item in get_items_response.items
+            ],
+            [('66VCHSJNUP', 5), ('1YMWWN1N4O', 1)],
+        )
+
+        # Updating to a quantity of zero removes the item too.
+        await cart.update_item(
+            self.context,
+            item=demo_pb2.CartItem(product_id='66VCHSJNUP', quantity=0),
+        )
+        get_items_response = await cart.get_items(self.context)
+        self.assertEqual(
+            [item.product_id for item in get_items_response.items],
+            ['1YMWWN1N4O'],
+        )
+
+    async def test_get_quote_reused(self) -> None:
+        """Asking for a quote for the same items and address again gives
+        the same quote, while asking for different items doesn't."""
+        shipping = Shipping.ref('jonathan')
+        address = demo_pb2.Address(city='Mountain View', zip_code=94043)
+
+        first = await shipping.get_quote(
+            self.context,
+            address=address,
+            items=[
+                demo_pb2.CartItem(product_id='OLJCESPC7Z', quantity=1),
+                demo_pb2.CartItem(product_id='66VCHSJNUP', quantity=2),
+            ],
+            quote_expiration_seconds=30,
+        )
+        # Same items, in a different order and added at a different time.
+        second = await shipping.get_quote(
+            self.context,
+            address=address,
+            items=[
+                demo_pb2.CartItem(
+                    product_id='66VCHSJNUP', quantity=2, added_at=42
+                ),
+                demo_pb2.CartItem(product_id='OLJCESPC7Z', quantity=1),
+            ],
+            quote_expiration_seconds=30,
+        )
+        self.assertEqual(first.quote.id, second.quote.id)
+
+        third = await shipping.get_quote(
+            self.context,
+            address=address,
+            items=[demo_pb2.CartItem(product_id='OLJCESPC7Z', quantity=1)],
+            quote_expiration_seconds=30,
+        )
+        self.assertNotEqual(first.quote.id, third.quote.id)
+
+    async def test_get_products(self) -> None:
+        """Look up several products at once, including one that doesn't
+        exist."""
+        product_catalog = ProductCatalog.ref(PRODUCT_CATALOG_ACTOR_ID)
+
+        response = await product_catalog.get_products(
+            self.context,
+            ids=['66VCHSJNUP', 'DOES-NOT-EXIST', 'OLJCESPC7Z'],
+        )
+
+        # Found products are returned in the order they were requested.
+        self.assertEqual(
+            [product.id for product in response.products],
+            ['66VCHSJNUP', 'OLJCESPC7Z'],
+        )
+        self.assertEqual(list(response.not_found_ids), ['DOES-NOT-EXIST'])
+
+    async def test_get_product_not_found(self) -> None:
+        """Look up a product that doesn't exist."""
+        product_catalog = ProductCatalog.ref(PRODUCT_CATALOG_ACTOR_ID)
+
+        with self.assertRaises(ProductCatalog.GetProductAborted) as aborted:
+            await product_catalog.get_product(
+                self.context,
+                id='DOES-NOT-EXIST',
+            )
+
+        self.assertEqual(type(aborted.exception.error), NotFound)
+
+    async def test_get_prices(self) -> None:
+        """Look up prices in the catalog's price snapshots."""
+        product_catalog = ProductCatalog.ref(PRODUCT_CATALOG_ACTOR_ID)
+
+        response = await product_catalog.get_prices(
+            self.context,
+            ids=['OLJCESPC7Z', 'DOES-NOT-EXIST'],
+        )
+        self.assertNotEqual(response.version, '')
+        self.assertEqual(
+            [(price.id, price.price) for price in response.prices],
+            [
+                (
+                    'OLJCESPC7Z',
+                    demo_pb2.Money(
+                        currency_code='USD', units=19, nanos=990000000
+                    ),
+                )
+            ],
+        )
+        self.assertEqual(list(response.not_found_ids), ['DOES-NOT-EXIST'])
+
+        # The same version can be asked for explicitly, but not one that
+        # doesn't exist.
+        self.assertEqual(
+            await product_catalog.get_prices(
+                self.context,
+                ids=['OLJCESPC7Z', 'DOES-NOT-EXIST'],
+                version=response.version,
+            ),
+            response,
+        )
+
+        with self.assertRaises(ProductCatalog.GetPricesAborted) as aborted:
+            await product_catalog.get_prices(
+                self.context,
+                ids=['OLJCESPC7Z'],
+                version='DOES-NOT-EXIST',
+            )
+
+        self.assertEqual(
+            type(aborted.exception.error),
+            demo_pb2.PriceSnapshotNotFound,
+        )
+
+    async def test_sharded_catalog(self) -> None:
+        """Partition the catalog across several shards and look up
+        products across all of them."""
+        shard_count = 3
+        os.environ[ENVVAR_PRODUCT_CATALOG_SHARDS] = str(shard_count)
+        try:
+            for index in range(shard_count):
+                await ProductCatalog.load_products(
+                    self.context,
+                    shard_id(index, shard_count),
+                    shard_index=index,
+                    shard_count=shard_count,
+                )
+
+            # Every product is in exactly one shard.
+            product_ids: list[str] = []
+            for index in range(shard_count):
+                list_products_response = await ProductCatalog.ref(
+                    shard_id(index, shard_count)
+                ).list_products(
+                    self.context,
+                    page_size=100,
+                )
+                product_ids.extend(
+                    product.id for product in list_products_response.products
+                )
+            self.assertEqual(len(product_ids), len(set(product_ids)))
+            self.assertIn('OLJCESPC7Z', product_ids)
+
+            get_products_response = await routing.get_products(
+                self.context,
+                ids=['66VCHSJNUP', 'DOES-NOT-EXIST', 'OLJCESPC7Z'],
+            )
+            self.assertEqual(
+                [product.id for product in get_products_response.products],
+                ['66VCHSJNUP', 'OLJCESPC7Z'],
+            )
+            self.assertEqual(
+                list(get_products_response.not_found_ids),
+                ['DOES-NOT-EXIST'],
+            )
+        finally:
+            del os.environ[ENVVAR_PRODUCT_CATALOG_SHARDS]
+
+    async def test_shards_on_one_server(self) -> None:
+        """Each of several shards served by the same server serves only
+        its own products."""
+        await self.rbt.down()
+        await self.rbt.up(self.application, servers=1)
+        context = self.rbt.create_external_context(name='one-server')
+
+        list_products_response = await ProductCatalog.ref(
+            PRODUCT_CATALOG_ACTOR_ID
+        ).list_products(
+            context,
+            page_size=100,
+        )
+        product_ids = [
+            product.id for product in list_products_response.products
+        ]
+
+        shard_count = 3
+        for index in range(shard_count):
+            await ProductCatalog.load_products(
+                context,
+                shard_id(index, shard_count),
+                shard_index=index,
+                shard_count=shard_count,
+            )
+
+        for index in range(shard_count):
+            shard_product_ids = [
+                product_id for product_id in product_ids
+                if shard_index(product_id, shard_count) == index
+            ]
+            get_products_response = await ProductCatalog.ref(
+                shard_id(index, shard_count)
+            ).get_products(
+                context,
+                ids=product_ids,
+            )
+            self.assertEqual(
+                [product.id for product in get_products_response.products],
+                shard_product_ids,
+            )
+            self.assertEqual(
+                len(get_products_response.not_found_ids),
+                len(product_ids) - len(shard_product_ids),
+            )
+
+    async def test_list_products(self) -> None:
+        """List a page of products in a category, with only some of their
+        fields."""
+        product_catalog = ProductCatalog.ref(PRODUCT_CATALOG_ACTOR_ID)
+
+        response = await product_catalog.list_products(
+            self.context,
+            page_size=1,
+            category='kitchen',
+            read_mask=FieldMask(paths=['id', 'name', 'price']),
+        )
+
+        self.assertEqual(len(response.products), 1)
+        self.assertNotEqual(response.next_page_token, '')
+        product = response.products[0]
+        self.assertNotEqual(product.name, '')
+        self.assertTrue(product.HasField('price'))
+        self.assertEqual(product.description, '')
+        self.assertEqual(product.picture, '')
+
+        # The next page continues where the first one left off.
+        response = await product_catalog.list_products(
+            self.context,
+            page_size=1,
+            page_token=response.next_page_token,
+            category='kitchen',
+        )
+        self.assertEqual(len(response.products), 1)
+        self.assertNotEqual(response.products[0].id, product.id)
+        self.assertIn('kitchen', response.products[0].categories)
+
+    async def test_initialize_again(self) -> None:
+        """Initializing again, e.g., on a restart, doesn't load the same
+        catalog twice."""
+        product_catalog = ProductCatalog.ref(PRODUCT_CATALOG_ACTOR_ID)
+        before = await product_catalog.list_products(
+            self.context,
+            page_size=1000,
+        )
+
+        await initialize(self.context)
+
+        after = await product_catalog.list_products(
+            self.context,
+            page_size=1000,
+        )
+        self.assertEqual(
+            [product.id for product in after.products],
+            [product.id for product in before.products],
+        )
+
+    async def test_search_products(self) -> None:
+        """Search the catalog, one page of results at a time."""
+        product_catalog = ProductCatalog.ref(PRODUCT_CATALOG_ACTOR_ID)
+
+        # A prefix of a term in the name matches.
+        response = await product_catalog.search_products(
+            self.context,
+            query='sungla',
+        )
+        self.assertEqual(
+            [product.id for product in response.results],
+            ['OLJCESPC7Z'],
+        )
+        self.assertEqual(response.next_page_token, '')
+
+        # Page through all of the products in the 'kitchen' category.
+        results: list[str] = []
+        page_token = ''
+        while True:
+            response = await product_catalog.search_products(
+                self.context,
+                query='kitchen',
+                page_size=2,
+                page_token=page_token,
+            )
+            self.assertLessEqual(len(response.results), 2)
+            results.extend(product.id for product in response.results)
+            page_token = response.next_page_token
+            if page_token == '':
+                break
+
+        self.assertEqual(len(results), response.total_size)
+        self.assertEqual(len(results), len(set(results)))
+
     async def test_currency_conversion(self) -> None:
         """Test a couple of currency conversions to make sure the Money format
         is handled correctly."""
@@ -212,6 +777,44 @@ class TestCase(unittest.IsolatedAsyncioTestCase):
                     expected_conversion,
                 )
 
+    async def test_currency_conversion_prices_only(self) -> None:
+        """Convert just the prices of several products at once."""
+        async with self.context.channel_manager.get_channel_to_legacy_grpc_service(
+            ServiceName('boutique.v1.CurrencyConverter'),
+        ) as channel:
+            stub = demo_pb2_grpc.CurrencyConverterStub(channel)
+            conversion = await stub.Convert(
+                demo_pb2.CurrencyConversionRequest(
+                    products=[
+                        demo_pb2.Product(
+                            id='a',
+                            name='A product',
+                            price=demo_pb2.Money(
+                                currency_code='EUR', units=2, nanos=0
+                            ),
+                        ),
+                        demo_pb2.Product(
+                            id='b',
+                            name='Another product',
+                            price=demo_pb2.Money(
+                                currency_code='USD', units=3, nanos=0
+                            ),
+                        ),
+                    ],
+                    to_code='USD',
+                    prices_only=True,
+                )
+            )
+
+        self.assertEqual(len(conversion.products), 0)
+        self.assertEqual([price.id for price in conversion.prices], ['a', 'b'])
+        self.assertEqual(conversion.prices[0].price.currency_code, 'USD')
+        self.assertEqual(conversion.prices[0].price.units, 2)
+        self.assertEqual(
+            conversion.prices[1].price,
+            demo_pb2.Money(currency_code='USD', units=3, nanos=0),
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,247 @@
+"""Load tests the whole application with concurrent shoppers.
+
+Each shopper repeatedly adds items to their cart, gets a shipping
+quote, places an order and lists their orders, the way the web
+frontend does. This is repeated for every combination of catalog size,
+cart size and number of concurrent shoppers, reporting the latency
+percentiles and throughput of each RPC.
+
+Results are printed, and also written as JSON to the file named by
+`LOAD_BENCHMARK_RESULTS_PATH` (`load_benchmark.json` in the system's
+temporary directory by default) so that they can be compared across
+runs to catch regressions.
+
+This is not run as part of the test suite; run it explicitly with:
+
+    pytest -s backend/tests/load_benchmark.py
+"""
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import unittest
+from boutique.v1 import demo_pb2
+from boutique.v1.demo_rbt import Cart, Checkout, Shipping
+from cart.servicer import CartServicer
+from checkout.servicer import CheckoutServicer
+from currencyconverter.servicer import CurrencyConverterServicer
+from mailer.servicer import MailerServicer
+from main import initialize
+from orderhistory.servicer import OrderHistoryServicer, list_orders
+from productcatalog.loader import LENGTH_DELIMITED_EXTENSION, write_catalog
+from productcatalog.servicer import (
+    ENVVAR_PRODUCT_CATALOG_PATH,
+    ProductCatalogServicer,
+)
+from reboot.aio.applications import Application
+from reboot.aio.tests import Reboot
+from reboot.thirdparty.mailgun.servicers import MockMessageServicer
+from shipping.servicer import ShippingServicer
+from synthetic_catalog import synthetic_products
+from typing import Any
+
+ENVVAR_LOAD_BENCHMARK_RESULTS_PATH = 'LOAD_BENCHMARK_RESULTS_PATH'
+
+CATALOG_SIZES = [100, 10_000]
+
+CART_SIZES = [1, 5, 20]
+
+CONCURRENT_SHOPPERS = [1, 8, 32]
+
+ORDERS_PER_SHOPPER = 5
+
+# The RPCs that are timed, in the order that a shopper makes them.
+RPCS = ['add_item', 'get_quote', 'place_order', 'list_orders']
+
+# Bump this whenever the format of the results changes.
+RESULTS_FORMAT_VERSION = 1
+
+
+def percentile(latencies: list[float], percent: int) -> float:
+    """Returns the `percent`th percentile of `latencies`."""
+    if len(latencies) == 1:
+        return latencies[0]
+    return statistics.quantiles(latencies, n=100)[percent - 1]
+
+
+class LoadBenchmark(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        # Any arbitrary mailgun API key works for the `MockMessageServicer`.
+        os.environ["MAILGUN_API_KEY"] = 'S3CR3T!'
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    async def _start(self, catalog_size: int) -> list[str]:
+        """Starts the application with a catalog of `catalog_size`
+        products, returning their IDs."""
+        products = synthetic_products(catalog_size)
+        path = os.path.join(
+            self.directory,
+            f'catalog-{catalog_size}{LENGTH_DELIMITED_EXTENSION}',
+        )
+        write_catalog(path, products)
+        os.environ[ENVVAR_PRODUCT_CATALOG_PATH] = path
+
+        self.rbt = Reboot()
+        await self.rbt.start()
+        await self.rbt.up(
+            Application(
+                servicers=[
+                    ProductCatalogServicer,
+                    CartServicer,
+                    CheckoutServicer,
+                    OrderHistoryServicer,
+                    MailerServicer,
+                    ShippingServicer,
+                    MockMessageServicer,
+                ],
+                legacy_grpc_servicers=[CurrencyConverterServicer],
+            ),
+        )
+
+        await initialize(self.rbt.create_external_context(name='initialize'))
+
+        return [product.id for product in products]
+
+    async def _stop(self) -> None:
+        await self.rbt.stop()
+        del os.environ[ENVVAR_PRODUCT_CATALOG_PATH]
+
+    async def _run(
+        self,
+        run_id: str,
+        product_ids: list[str],
+        cart_size: int,
+        shoppers: int,
+    ) -> tuple[dict[str, list[float]], float]:
+        """Runs `shoppers` concurrent shoppers, returning the latencies
+        (in milliseconds) of each RPC and how long it all took (in
+        seconds)."""
+        latencies_ms: dict[str, list[float]] = {rpc: [] for rpc in RPCS}
+
+        async def timed(rpc: str, call: Any) -> Any:
+            start = time.perf_counter()
+            response = await call
+            latencies_ms[rpc].append((time.perf_counter() - start) * 1000)
+            return response
+
+        async def shopper(user_id: str) -> None:
+            context = self.rbt.create_external_context(name=user_id)
+            rng = random.Random(user_id)
+            cart = Cart.ref(user_id)
+
+            for _ in range(ORDERS_PER_SHOPPER):
+                items = [
+                    demo_pb2.CartItem(product_id=product_id, quantity=1)
+                    for product_id in rng.sample(product_ids, k=cart_size)
+                ]
+                for item in items:
+                    await timed('add_item', cart.add_item(context, item=item))
+
+                get_quote_response = await timed(
+                    'get_quote',
+                    Shipping.ref(user_id).get_quote(
+                        context,
+                        items=items,
+                        quote_expiration_seconds=60,
+                    ),
+                )
+
+                await timed(
+                    'place_order',
+                    Checkout.ref(user_id).place_order(
+                        context,
+                        user_id=user_id,
+                        user_currency='EUR',
+                        email=f'{user_id}@example.com',
+                        quote=get_quote_response.quote,
+                    ),
+                )
+
+                await timed(
+                    'list_orders',
+                    list_orders(context, user_id),
+                )
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(shopper(f'{run_id}-{i}') for i in range(shoppers))
+        )
+        return latencies_ms, time.perf_counter() - start
+
+    async def test_load(self) -> None:
+        results: list[dict[str, Any]] = []
+
+        print()
+        print(
+            f"{'products':>9} {'cart':>5} {'shoppers':>9} {'rpc':<12} "
+            f"{'calls':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} "
+            f"{'calls/s':>9}"
+        )
+
+        for catalog_size in CATALOG_SIZES:
+            product_ids = await self._start(catalog_size)
+            try:
+                for cart_size in CART_SIZES:
+                    for shoppers in CONCURRENT_SHOPPERS:
+                        latencies_ms, elapsed = await self._run(
+                            f'shopper-{catalog_size}-{cart_size}-{shoppers}',
+                            product_ids,
+                            cart_size,
+                            shoppers,
+                        )
+                        for rpc in RPCS:
+                            result = {
+                                'catalog_size': catalog_size,
+                                'cart_size': cart_size,
+                                'shoppers': shoppers,
+                                'rpc': rpc,
+                                'calls': len(latencies_ms[rpc]),
+                                'p50_ms': percentile(latencies_ms[rpc], 50),
+                                'p95_ms': percentile(latencies_ms[rpc], 95),
+                                'p99_ms': percentile(latencies_ms[rpc], 99),
+                                'calls_per_second':
+                                    len(latencies_ms[rpc]) / elapsed,
+                            }
+                            results.append(result)
+                            print(
+                                f"{catalog_size:>9} {cart_size:>5} "
+                                f"{shoppers:>9} {rpc:<12} "
+                                f"{result['calls']:>6} "
+                                f"{result['p50_ms']:>9.2f} "
+                                f"{result['p95_ms']:>9.2f} "
+                                f"{result['p99_ms']:>9.2f} "
+                                f"{result['calls_per_second']:>9.1f}"
+                            )
+            finally:
+                await self._stop()
+
+        path = os.environ.get(
+            ENVVAR_LOAD_BENCHMARK_RESULTS_PATH,
+            os.path.join(tempfile.gettempdir(), 'load_benchmark.json'),
+        )
+        with open(path, 'w') as file:
+            json.dump(
+                {
+                    'format_version': RESULTS_FORMAT_VERSION,
+                    'time': time.time(),
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'orders_per_shopper': ORDERS_PER_SHOPPER,
+                    'results': results,
+                },
+                file,
+                indent=2,
+            )
+        print(f"Wrote results to '{path}'")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import unittest
+from boutique.v1 import demo_pb2
+from google.protobuf.json_format import ParseDict
+from productcatalog import loader
+from productcatalog.loader import catalog_version, load_catalog, write_catalog
+
+PRODUCTS_JSON = os.path.join(
+    os.path.dirname(__file__), '..', 'src', 'productcatalog', 'products.json'
+)
+
+
+class LoaderTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with open(PRODUCTS_JSON) as file:
+            self.products = list(
+                ParseDict(json.load(file), demo_pb2.ProductCatalog()).products
+            )
+
+    def test_formats_round_trip(self) -> None:
+        """Every format loads back the products that were written."""
+        with tempfile.TemporaryDirectory() as directory:
+            for extension in ['.json', '.binpb', '.ldpb']:
+                path = os.path.join(directory, f'products{extension}')
+                write_catalog(path, self.products)
+
+                catalog = demo_pb2.ProductCatalog()
+                load_catalog(path, catalog)
+
+                self.assertEqual(list(catalog.products), self.products)
+                self.assertNotEqual(catalog.version, '')
+
+    def test_load_twice(self) -> None:
+        """Loading into a catalog replaces, rather than appends to, the
+        products that were loaded before."""
+        catalog = demo_pb2.ProductCatalog()
+        load_catalog(PRODUCTS_JSON, catalog)
+        load_catalog(PRODUCTS_JSON, catalog)
+
+        self.assertEqual(list(catalog.products), self.products)
+
+    def test_small_chunks(self) -> None:
+        """Products that span chunk boundaries are loaded correctly."""
+        chunk_size = loader.CHUNK_SIZE
+        loader.CHUNK_SIZE = 7
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'products.ldpb')
+                write_catalog(path, self.products)
+
+                for path in [PRODUCTS_JSON, path]:
+                    catalog = demo_pb2.ProductCatalog()
+                    load_catalog(path, catalog)
+                    self.assertEqual(list(catalog.products), self.products)
+        finally:
+            loader.CHUNK_SIZE = chunk_size
+
+    def test_version_changes_with_content(self) -> None:
+        """A catalog's version changes when its content does."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.ldpb')
+
+            write_catalog(path, self.products)
+            catalog = demo_pb2.ProductCatalog()
+            load_catalog(path, catalog)
+            version = catalog.version
+
+            write_catalog(path, self.products[1:])
+            catalog = demo_pb2.ProductCatalog()
+            load_catalog(path, catalog)
+            self.assertNotEqual(catalog.version, version)
+
+    def test_catalog_version(self) -> None:
+        """A catalog's version can be found without loading it."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'products.ldpb')
+            write_catalog(path, self.products)
+
+            catalog = demo_pb2.ProductCatalog()
+            load_catalog(path, catalog)
+            self.assertEqual(catalog_version(path), catalog.version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import logger
+import unittest
+from logger import Metrics, instrumented
+
+
+class Servicer:
+
+    async def method(self) -> str:
+        return 'result'
+
+    async def _private(self) -> None:
+        pass
+
+
+class MetricsTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.metrics = logger.metrics
+        self.addCleanup(setattr, logger, 'metrics', self.metrics)
+
+    def test_disabled(self) -> None:
+        metrics = Metrics(enabled=False)
+        with metrics.timer('A.method/phase'):
+            pass
+        metrics.record_size('A.field', 3)
+        self.assertEqual(metrics.snapshot(), {'timings': {}, 'max_sizes': {}})
+
+    def test_timings_and_sizes(self) -> None:
+        metrics = Metrics(enabled=True)
+        metrics.record_time('A.method', 0.5)
+        metrics.record_time('A.method', 1.5)
+        with metrics.timer('A.method/phase'):
+            pass
+        metrics.record_size('A.field', 3)
+        metrics.record_size('A.field', 2)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(
+            snapshot['timings']['A.method'],
+            {'count': 2, 'total_seconds': 2.0, 'max_seconds': 1.5},
+        )
+        self.assertEqual(snapshot['timings']['A.method/phase']['count'], 1)
+        self.assertEqual(snapshot['max_sizes'], {'A.field': 3})
+
+        prometheus = metrics.prometheus()
+        self.assertIn(
+            'demo_duration_seconds_count{name="A.method"} 2\n',
+            prometheus,
+        )
+        self.assertIn(
+            'demo_duration_seconds_sum{name="A.method"} 2.0\n',
+            prometheus,
+        )
+        self.assertIn('demo_state_size_max{name="A.field"} 3\n', prometheus)
+
+    async def test_instrumented(self) -> None:
+        logger.metrics = Metrics(enabled=True)
+
+        @instrumented
+        class TimedServicer(Servicer):
+
+            async def method(self) -> str:
+                return 'timed'
+
+            async def _private(self) -> None:
+                pass
+
+        self.assertEqual(await TimedServicer().method(), 'timed')
+        await TimedServicer()._private()
+        self.assertEqual(
+            list(logger.metrics.timings),
+            ['Timed.method'],
+        )
+
+    def test_instrumented_disabled(self) -> None:
+        logger.metrics = Metrics(enabled=False)
+        method = Servicer.method
+        self.assertIs(instrumented(Servicer), Servicer)
+        self.assertIs(Servicer.method, method)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from boutique.v1 import demo_pb2
+from orderhistory.servicer import orders_page
+
+
+def _orders(first: int, count: int) -> list[demo_pb2.OrderResult]:
+    return [
+        demo_pb2.OrderResult(order_id=str(i))
+        for i in range(first, first + count)
+    ]
+
+
+def _ids(response: demo_pb2.OrdersResponse) -> list[str]:
+    return [order.order_id for order in response.orders]
+
+
+class OrdersPageTestCase(unittest.TestCase):
+
+    def test_pages_newest_first(self) -> None:
+        orders = _orders(0, 5)
+
+        response = orders_page(orders, 2, '')
+        self.assertEqual(_ids(response), ['4', '3'])
+
+        response = orders_page(orders, 2, response.next_page_token)
+        self.assertEqual(_ids(response), ['2', '1'])
+
+        response = orders_page(orders, 2, response.next_page_token)
+        self.assertEqual(_ids(response), ['0'])
+        self.assertEqual(response.next_page_token, '')
+
+    def test_page_token_survives_new_orders(self) -> None:
+        """Orders placed between pages don't shift later pages."""
+        orders = _orders(0, 4)
+        response = orders_page(orders, 2, '')
+        self.assertEqual(_ids(response), ['3', '2'])
+
+        orders += _orders(4, 3)
+        response = orders_page(orders, 2, response.next_page_token)
+        self.assertEqual(_ids(response), ['1', '0'])
+
+    def test_invalid_page_token(self) -> None:
+        for page_token in ['-1', 'nope', '10']:
+            with self.assertRaises(ValueError):
+                orders_page(_orders(0, 5), 2, page_token)
+
+
+if __name__ == '__main__':
+    unittest.main()
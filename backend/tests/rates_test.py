@@ -0,0 +1,174 @@
+import json
+import os
+import tempfile
+import unittest
+from boutique.v1 import demo_pb2
+from currencyconverter import converter
+from currencyconverter.converter import (
+    ENVVAR_CURRENCY_CONVERSIONS_PATH,
+    CurrencyConverter,
+    convert_prices,
+)
+from currencyconverter.rates import RateTable
+from currencyconverter.servicer import CurrencyConverterServicer
+from typing import Any
+
+
+class RateTableTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.rate_table = RateTable(
+            {
+                'EUR': '1.0',
+                'USD': '1.1305',
+                'JPY': '126.40',
+            }
+        )
+
+    def test_convert_is_exact(self) -> None:
+        """Conversions don't suffer from floating point error."""
+        self.assertEqual(
+            self.rate_table.convert(1, 0, 'EUR', 'USD'),
+            (1, 130500000),
+        )
+        # 0.01 USD is 0.00884564352... EUR, which rounds to the nearest
+        # nano rather than being truncated.
+        self.assertEqual(
+            self.rate_table.convert(0, 10000000, 'USD', 'EUR'),
+            (0, 8845644),
+        )
+        # A round trip gets back exactly where it started.
+        units, nanos = self.rate_table.convert(19, 990000000, 'USD', 'JPY')
+        self.assertEqual(
+            self.rate_table.convert(units, nanos, 'JPY', 'USD'),
+            (19, 990000000),
+        )
+
+    def test_convert_negative_amount(self) -> None:
+        """Units and nanos of a negative amount are both negative."""
+        self.assertEqual(
+            self.rate_table.convert(-1, -750000000, 'EUR', 'USD'),
+            (-1, -978375000),
+        )
+
+    def test_convert_unsupported_currency(self) -> None:
+        with self.assertRaises(KeyError):
+            self.rate_table.convert(1, 0, 'EUR', 'XYZ')
+
+    def test_conversions_are_cached(self) -> None:
+        self.rate_table.convert(8, 990000000, 'USD', 'EUR')
+        self.rate_table.convert(8, 990000000, 'USD', 'EUR')
+        self.assertEqual(self.rate_table.convert.cache_info().hits, 1)
+
+        # A new table starts with an empty cache.
+        self.assertEqual(
+            RateTable({'EUR': '1.0'}).convert.cache_info().currsize,
+            0,
+        )
+
+    def test_convert_prices(self) -> None:
+        self.assertEqual(
+            convert_prices(
+                self.rate_table,
+                [
+                    demo_pb2.Money(currency_code='EUR', units=1),
+                    demo_pb2.Money(currency_code='USD', units=1, nanos=1305),
+                ],
+                'USD',
+            ),
+            [
+                demo_pb2.Money(
+                    currency_code='USD', units=1, nanos=130500000
+                ),
+                demo_pb2.Money(currency_code='USD', units=1, nanos=1305),
+            ],
+        )
+
+        with self.assertRaises(ValueError):
+            convert_prices(
+                self.rate_table,
+                [demo_pb2.Money(currency_code='XYZ', units=1)],
+                'USD',
+            )
+
+
+class ReloadTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'rates.json')
+        self.write_rates({'EUR': '1.0', 'USD': '1.1305'})
+
+        os.environ[ENVVAR_CURRENCY_CONVERSIONS_PATH] = self.path
+        self.addCleanup(os.environ.pop, ENVVAR_CURRENCY_CONVERSIONS_PATH)
+
+        # Check for changes on every call.
+        self.interval = converter.RATES_CHECK_INTERVAL_SECONDS
+        converter.RATES_CHECK_INTERVAL_SECONDS = 0
+
+        self.converter = CurrencyConverter()
+        self.servicer = CurrencyConverterServicer(self.converter)
+
+    def tearDown(self) -> None:
+        converter.RATES_CHECK_INTERVAL_SECONDS = self.interval
+
+    def write_rates(self, rates: dict[str, str]) -> None:
+        with open(self.path, 'w') as file:
+            json.dump(rates, file)
+        # Make sure the modification time changes, however coarse the
+        # file system's timestamps are.
+        os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 10**9))
+
+    async def convert(self, to_code: str) -> Any:
+        return await self.servicer.Convert(
+            demo_pb2.CurrencyConversionRequest(
+                products=[
+                    demo_pb2.Product(
+                        id='a',
+                        price=demo_pb2.Money(currency_code='EUR', units=1),
+                    )
+                ],
+                to_code=to_code,
+                prices_only=True,
+            ),
+            None,  # type: ignore[arg-type]
+        )
+
+    async def test_reload(self) -> None:
+        """Changes to the rates file are picked up without a restart,
+        along with a new version."""
+        before = await self.servicer.GetSupportedCurrencies(
+            demo_pb2.Empty(),
+            None,  # type: ignore[arg-type]
+        )
+        self.assertEqual(list(before.currency_codes), ['EUR', 'USD'])
+        self.assertNotEqual(before.rates_version, '')
+
+        self.write_rates({'EUR': '1.0', 'USD': '1.2', 'GBP': '0.85'})
+
+        after = await self.servicer.GetSupportedCurrencies(
+            demo_pb2.Empty(),
+            None,  # type: ignore[arg-type]
+        )
+        self.assertEqual(list(after.currency_codes), ['EUR', 'USD', 'GBP'])
+        self.assertNotEqual(after.rates_version, before.rates_version)
+
+        response = await self.convert('USD')
+        self.assertEqual(response.rates_version, after.rates_version)
+        self.assertEqual(response.prices[0].price.nanos, 200000000)
+
+    async def test_reload_failure_keeps_rates(self) -> None:
+        """A broken rates file doesn't replace the current rates."""
+        version = self.converter.rate_table.version
+
+        with open(self.path, 'w') as file:
+            file.write('{')
+
+        response = await self.convert('USD')
+        self.assertEqual(response.rates_version, version)
+        self.assertEqual(response.prices[0].price.nanos, 130500000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Benchmarks `SearchProducts` query latency against catalog size.
+
+This is not run as part of the test suite; run it explicitly with:
+
+    pytest -s backend/tests/search_benchmark.py
+"""
+import statistics
+import time
+import unittest
+from productcatalog.index import CatalogIndex
+from synthetic_catalog import synthetic_products
+
+CATALOG_SIZES = [1_000, 10_000, 100_000]
+
+QUERIES = [
+    'mug',  # A single exact term.
+    'leather boots',  # Multiple terms, all must match.
+    'wat',  # A prefix.
+    'handmade ceramic kitchen',  # Name, description and category terms.
+    'nonexistent',  # No matches.
+]
+
+ITERATIONS = 20
+
+# Queries fetch the first page of results, like `SearchProducts` does.
+PAGE_SIZE = 20
+
+
+class SearchBenchmark(unittest.TestCase):
+
+    def test_query_latency(self) -> None:
+        print()
+        print(
+            f"{'products':>10} {'build (ms)':>12} "
+            f"{'query':<26} {'matches':>8} {'p50 (ms)':>10} {'max (ms)':>10}"
+        )
+
+        for size in CATALOG_SIZES:
+            products = synthetic_products(size)
+
+            start = time.perf_counter()
+            index = CatalogIndex('benchmark', products)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            for query in QUERIES:
+                latencies_ms = []
+                for _ in range(ITERATIONS):
+                    start = time.perf_counter()
+                    matches, total_size = index.search(
+                        query,
+                        limit=PAGE_SIZE,
+                    )
+                    latencies_ms.append((time.perf_counter() - start) * 1000)
+
+                print(
+                    f"{size:>10} {build_ms:>12.1f} {query:<26} "
+                    f"{total_size:>8} "
+                    f"{statistics.median(latencies_ms):>10.2f} "
+                    f"{max(latencies_ms):>10.2f}"
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
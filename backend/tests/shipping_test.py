@@ -0,0 +1,29 @@
+import unittest
+from boutique.v1 import demo_pb2
+from shipping.servicer import quote_reusable
+
+
+class QuoteReusableTestCase(unittest.TestCase):
+
+    def test_reusable(self) -> None:
+        quote = demo_pb2.ShippingQuote(expires_at_ms=30_000)
+        self.assertTrue(quote_reusable(quote, 30, 0))
+        self.assertTrue(quote_reusable(quote, 30, 14_999))
+
+    def test_not_enough_time_left(self) -> None:
+        """A quote with exactly the minimum time left isn't reused."""
+        quote = demo_pb2.ShippingQuote(expires_at_ms=30_000)
+        self.assertFalse(quote_reusable(quote, 30, 15_000))
+        self.assertFalse(quote_reusable(quote, 30, 20_000))
+
+    def test_expired(self) -> None:
+        """A quote that expires now, or has expired, is never reused,
+        even when no time need be left on it."""
+        quote = demo_pb2.ShippingQuote(expires_at_ms=1_000)
+        self.assertFalse(quote_reusable(quote, 0, 1_000))
+        self.assertFalse(quote_reusable(quote, 0, 2_000))
+        self.assertTrue(quote_reusable(quote, 0, 999))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Benchmarks the time from starting the application to serving its
+first request, against catalog size.
+
+Both a cold start, with no state, and a restart, with the state of the
+cold start, are measured; a restart doesn't need to reload a catalog
+that hasn't changed.
+
+This is not run as part of the test suite; run it explicitly with:
+
+    pytest -s backend/tests/startup_benchmark.py
+"""
+import os
+import tempfile
+import time
+import unittest
+from cart.servicer import CartServicer
+from checkout.servicer import CheckoutServicer
+from currencyconverter.servicer import CurrencyConverterServicer
+from mailer.servicer import MailerServicer
+from main import initialize
+from orderhistory.servicer import OrderHistoryServicer
+from productcatalog import routing
+from productcatalog.loader import LENGTH_DELIMITED_EXTENSION, write_catalog
+from productcatalog.servicer import (
+    ENVVAR_PRODUCT_CATALOG_PATH,
+    ProductCatalogServicer,
+)
+from reboot.aio.applications import Application
+from reboot.aio.tests import Reboot
+from reboot.thirdparty.mailgun.servicers import MockMessageServicer
+from shipping.servicer import ShippingServicer
+from synthetic_catalog import synthetic_products
+
+CATALOG_SIZES = [1_000, 10_000, 100_000]
+
+
+class StartupBenchmark(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+        self.application = Application(
+            servicers=[
+                ProductCatalogServicer,
+                CartServicer,
+                CheckoutServicer,
+                OrderHistoryServicer,
+                MailerServicer,
+                ShippingServicer,
+                MockMessageServicer,
+            ],
+            legacy_grpc_servicers=[CurrencyConverterServicer],
+        )
+
+    async def _up_until_first_request(
+        self,
+        rbt: Reboot,
+        product_id: str,
+    ) -> float:
+        """Brings up the application and waits for it to serve a
+        request, returning how long that took in seconds."""
+        start = time.perf_counter()
+        await rbt.up(self.application)
+        context = rbt.create_external_context(name='startup')
+        await initialize(context)
+        await routing.get_products(context, ids=[product_id])
+        return time.perf_counter() - start
+
+    async def test_time_to_first_request(self) -> None:
+        print()
+        print(f"{'products':>10} {'cold start (s)':>15} {'restart (s)':>12}")
+
+        for size in CATALOG_SIZES:
+            products = synthetic_products(size)
+            path = os.path.join(
+                self.directory,
+                f'catalog-{size}{LENGTH_DELIMITED_EXTENSION}',
+            )
+            write_catalog(path, products)
+            os.environ[ENVVAR_PRODUCT_CATALOG_PATH] = path
+
+            rbt = Reboot()
+            await rbt.start()
+            try:
+                cold_start = await self._up_until_first_request(
+                    rbt,
+                    products[0].id,
+                )
+                await rbt.down()
+                restart = await self._up_until_first_request(
+                    rbt,
+                    products[0].id,
+                )
+            finally:
+                await rbt.stop()
+                del os.environ[ENVVAR_PRODUCT_CATALOG_PATH]
+
+            print(f"{size:>10} {cold_start:>15.2f} {restart:>12.2f}")
+
+
+if __name__ == '__main__':
+    unittest.main()
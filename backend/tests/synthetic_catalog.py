@@ -0,0 +1,43 @@
+import random
+from boutique.v1 import demo_pb2
+
+# Words to build product names and descriptions from; a catalog built
+# from a fixed vocabulary has realistic token overlap between products.
+WORDS = [
+    'vintage', 'classic', 'modern', 'sleek', 'cotton', 'leather', 'bamboo',
+    'glass', 'ceramic', 'steel', 'wooden', 'woven', 'linen', 'silk', 'wool',
+    'sunglasses', 'shirt', 'jacket', 'loafers', 'watch', 'mug', 'jar',
+    'candle', 'holder', 'hairdryer', 'shakers', 'lamp', 'bowl', 'plate',
+    'scarf', 'hat', 'bag', 'wallet', 'belt', 'boots', 'sneakers', 'kettle',
+    'blue', 'red', 'green', 'black', 'white', 'gold', 'silver', 'natural',
+    'handmade', 'organic', 'durable', 'lightweight', 'waterproof', 'compact',
+]
+
+CATEGORIES = [
+    'accessories', 'clothing', 'footwear', 'hair', 'beauty', 'decor',
+    'home', 'kitchen', 'garden', 'travel', 'vintage', 'office',
+]
+
+
+def synthetic_products(
+    count: int,
+    *,
+    seed: int = 0,
+) -> list[demo_pb2.Product]:
+    """Returns `count` randomly generated (but, for a given `seed`,
+    deterministic) products."""
+    rng = random.Random(seed)
+    return [
+        demo_pb2.Product(
+            id=f'SYNTHETIC-{i:08d}',
+            name=' '.join(rng.choices(WORDS, k=3)).title(),
+            description=' '.join(rng.choices(WORDS, k=20)).capitalize() + '.',
+            picture='/static/img/products/mug.jpg',
+            price=demo_pb2.Money(
+                currency_code='USD',
+                units=rng.randint(1, 500),
+                nanos=rng.choice([0, 490000000, 990000000]),
+            ),
+            categories=rng.sample(CATEGORIES, k=2),
+        ) for i in range(count)
+    ]
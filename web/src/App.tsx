@@ -6,6 +6,7 @@ import { Route, Routes } from "react-router-dom";
 import { Cart } from "./Cart";
 import { Header } from "./Header";
 import { useCart } from "./gen/boutique/v1/demo_rbt_react";
+import { getSupportedCurrencies } from "./helpers";
 import "./static/styles/cart.css";
 import "./static/styles/order.css";
 import "./static/styles/styles.css";
@@ -19,11 +20,8 @@ function App() {
   const { useGetItems } = useCart({ id: CART_ACTOR_ID });
 
   useEffect(() => {
-    fetch(`${import.meta.env.VITE_REBOOT_URL}/get_supported_currencies`)
-      .then(async (res) => res.json())
-      .then((json: { currencyCodes: string[] }) => {
-        setCurrencies(json.currencyCodes);
-      })
+    getSupportedCurrencies()
+      .then(setCurrencies)
       .catch((error: unknown) => console.log(error));
   }, []);
 
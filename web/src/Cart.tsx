@@ -1,24 +1,24 @@
 import { PastOrders } from "./PastOrders";
 import {
   Address,
+  CartItem,
   CreditCardInfo,
   Money,
+  OrderResult,
   ShippingQuote,
 } from "./gen/boutique/v1/demo_pb";
 import {
   useCart,
   useCheckout,
-  useProductCatalog,
+  useOrderHistory,
   useShipping,
 } from "./gen/boutique/v1/demo_rbt_react";
 import {
-  CATALOG_SINGLETON_ID,
   ProductItem,
   convertedShippingCost,
-  multiplyMoney,
   renderMoney,
-  totalOrderCost,
-  useCurrencyConvertProductItems,
+  sumMoney,
+  useCatalogGetProduct,
 } from "./helpers";
 import { useEffect, useState } from "react";
 import { Link } from "react-router-dom";
@@ -31,43 +31,46 @@ const USER_ADDRESS = new Address({
   country: "USA",
 });
 
+// How many of the user's most recent orders to show.
+const PAST_ORDERS_PAGE_SIZE = 10;
+
 interface CartProps {
   cartId: string;
   userCurrency: string;
 }
 
 export const Cart = ({ cartId, userCurrency }: CartProps) => {
-  const [productItems, setProductItems] = useState<ProductItem[]>([]);
   const [shippingCost, setShippingCost] = useState<Money>(new Money());
   const [shippingQuote, setShippingQuote] = useState<ShippingQuote>();
   const [email, setEmail] = useState("someone@example.com");
-  const { getProduct } = useProductCatalog({ id: CATALOG_SINGLETON_ID });
-  const { getQuote } = useShipping({ id: "shipping" });
-  const { useOrders, placeOrder } = useCheckout({ id: "checkout" });
-  const { useGetItems, emptyCart } = useCart({ id: cartId });
+  const getProduct = useCatalogGetProduct();
+  // Each user has their own shipping quotes and checkout.
+  const { getQuote } = useShipping({ id: cartId });
+  const { placeOrder } = useCheckout({ id: cartId });
+  const { useListOrders } = useOrderHistory({ id: cartId });
+  const { useGetPricedCart, addItems, emptyCart, removeItem } = useCart({
+    id: cartId,
+  });
 
-  const { response: useOrdersResponse } = useOrders();
+  const { response: useOrdersResponse } = useListOrders({
+    pageSize: PAST_ORDERS_PAGE_SIZE,
+  });
 
-  const { response: useGetItemsResponse } = useGetItems();
+  // The items in the cart along with their products, already priced in
+  // the user's currency, in one call.
+  const { response: useGetPricedCartResponse } = useGetPricedCart({
+    currencyCode: userCurrency,
+  });
 
   useEffect(() => {
     async function runEffect() {
-      if (useGetItemsResponse === undefined) return;
-
-      const nextProductItems = [];
-      for (const cartItem of useGetItemsResponse.items) {
-        // For every item in the cart, find the associated product.
-        const { response: productDetails } = await getProduct({
-          id: cartItem.productId,
-        });
-        if (productDetails === undefined) continue;
-        nextProductItems.push({ product: productDetails, item: cartItem });
-      }
-      setProductItems(nextProductItems);
+      if (useGetPricedCartResponse === undefined) return;
 
       const { response: quoteDetails } = await getQuote({
         address: USER_ADDRESS,
-        items: useGetItemsResponse.items,
+        items: useGetPricedCartResponse.items.flatMap(({ item }) =>
+          item !== undefined ? [item] : []
+        ),
         quoteExpirationSeconds: 5000,
       });
 
@@ -86,20 +89,24 @@ export const Cart = ({ cartId, userCurrency }: CartProps) => {
     }
 
     runEffect();
-  }, [useGetItemsResponse, userCurrency]);
+  }, [useGetPricedCartResponse, userCurrency]);
 
-  const convertedProductItems = useCurrencyConvertProductItems(
-    productItems,
-    userCurrency
-  );
-
-  if (useGetItemsResponse === undefined)
+  if (useGetPricedCartResponse === undefined)
     return <div style={{ height: "100vh" }}></div>;
-  const totalCost = totalOrderCost(
-    convertedProductItems,
-    shippingCost,
-    userCurrency
-  );
+
+  const convertedProductItems: (ProductItem & { lineTotal?: Money })[] =
+    useGetPricedCartResponse.items.flatMap(({ item, product, lineTotal }) =>
+      item !== undefined && product !== undefined
+        ? [{ item, product, lineTotal }]
+        : []
+    );
+  const itemsCost = useGetPricedCartResponse.total ?? new Money();
+  // Until the shipping quote has been converted to the user's currency
+  // there is nothing to add.
+  const totalCost =
+    shippingCost.currencyCode === itemsCost.currencyCode
+      ? sumMoney(itemsCost, shippingCost)
+      : itemsCost;
 
   const handlePlaceOrder = async () => {
     const { aborted } = await placeOrder(
@@ -115,6 +122,9 @@ export const Cart = ({ cartId, userCurrency }: CartProps) => {
         }),
         quote: shippingQuote,
         email,
+        // Charge the prices that the user was shown, even if the
+        // catalog has changed since.
+        catalogVersion: useGetPricedCartResponse.catalogVersion,
       },
       { metadata: convertedProductItems }
     );
@@ -123,13 +133,32 @@ export const Cart = ({ cartId, userCurrency }: CartProps) => {
     }
   };
 
+  // Add everything from a past order back to the cart in one go.
+  const handleReorder = async (order: OrderResult) => {
+    const { aborted } = await addItems({
+      items: order.items.flatMap(({ item }) =>
+        item !== undefined
+          ? [
+              new CartItem({
+                productId: item.productId,
+                quantity: item.quantity,
+              }),
+            ]
+          : []
+      ),
+    });
+    if (aborted !== undefined) {
+      console.warn(aborted);
+    }
+  };
+
   return (
     <>
       <div className="local">
         <span className="platform-flag">local</span>
       </div>
       <main role="main" className="cart-sections">
-        {useGetItemsResponse.items.length === 0 ? (
+        {convertedProductItems.length === 0 ? (
           <section className="empty-cart-section">
             <h3>Your shopping cart is empty!</h3>
             <p>Items you add to your shopping cart will appear here.</p>
@@ -143,7 +172,7 @@ export const Cart = ({ cartId, userCurrency }: CartProps) => {
               <div className="col-lg-6 col-xl-5 offset-xl-1 cart-summary-section">
                 <div className="row mb-3 py-2">
                   <div className="col-4 pl-md-0">
-                    <h3>Cart ({useGetItemsResponse.items.length})</h3>
+                    <h3>Cart ({convertedProductItems.length})</h3>
                   </div>
                   <div className="col-8 pr-md-0 text-right">
                     <button
@@ -161,7 +190,7 @@ export const Cart = ({ cartId, userCurrency }: CartProps) => {
                     </Link>
                   </div>
                 </div>
-                {convertedProductItems.map((productItem: ProductItem) => (
+                {convertedProductItems.map((productItem) => (
                   <div
                     className="row cart-summary-item-row"
                     key={productItem.product.id}
@@ -186,16 +215,21 @@ export const Cart = ({ cartId, userCurrency }: CartProps) => {
                       </div>
                       <div className="row">
                         <div className="col">
-                          Quantity: {productItem.item.quantity}
+                          Quantity: {productItem.item.quantity}{" "}
+                          <button
+                            className="cymbal-button-secondary"
+                            onClick={() =>
+                              removeItem({
+                                productId: productItem.item.productId,
+                              })
+                            }
+                          >
+                            Remove
+                          </button>
                         </div>
                         <div className="col pr-md-0 text-right">
                           <strong>
-                            {renderMoney(
-                              multiplyMoney(
-                                productItem.product.price,
-                                productItem.item.quantity
-                              )
-                            )}
+                            {renderMoney(productItem.lineTotal)}
                           </strong>
                         </div>
                       </div>
@@ -396,6 +430,7 @@ export const Cart = ({ cartId, userCurrency }: CartProps) => {
           response={useOrdersResponse}
           userCurrency={userCurrency}
           pendingPlaceOrderMutations={placeOrder.pending}
+          reorder={handleReorder}
         />
       </main>
     </>
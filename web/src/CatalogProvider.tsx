@@ -0,0 +1,51 @@
+import { ReactNode, useMemo } from "react";
+import {
+  UseProductCatalogApi,
+  useProductCatalog,
+} from "./gen/boutique/v1/demo_rbt_react";
+import { CATALOG_SHARD_IDS, CatalogShardsContext } from "./helpers";
+
+// Uses the catalog shard at `index`, then renders the next shard, or,
+// after the last, provides all of them to `children`. Each shard needs
+// its own `useProductCatalog()`, and a component must call the same
+// hooks on every render, so each calls it for just one shard.
+const CatalogShard = ({
+  index,
+  shards,
+  children,
+}: {
+  index: number;
+  shards: Map<string, UseProductCatalogApi["getProduct"]>;
+  children: ReactNode;
+}) => {
+  const id = CATALOG_SHARD_IDS[index];
+  const { getProduct } = useProductCatalog({ id });
+
+  const shardsSoFar = useMemo(
+    () => new Map(shards).set(id, getProduct),
+    [shards, id, getProduct]
+  );
+
+  if (index + 1 < CATALOG_SHARD_IDS.length) {
+    return (
+      <CatalogShard index={index + 1} shards={shardsSoFar}>
+        {children}
+      </CatalogShard>
+    );
+  }
+
+  return (
+    <CatalogShardsContext.Provider value={shardsSoFar}>
+      {children}
+    </CatalogShardsContext.Provider>
+  );
+};
+
+const NO_SHARDS = new Map<string, UseProductCatalogApi["getProduct"]>();
+
+// Makes every catalog shard available to `useCatalogGetProduct()`.
+export const CatalogProvider = ({ children }: { children: ReactNode }) => (
+  <CatalogShard index={0} shards={NO_SHARDS}>
+    {children}
+  </CatalogShard>
+);
@@ -1,27 +1,25 @@
+import { FieldMask } from "@bufbuild/protobuf";
 import { useProductCatalog } from "./gen/boutique/v1/demo_rbt_react";
 import { Link } from "react-router-dom";
 import {
-  CATALOG_SINGLETON_ID,
+  CATALOG_SHARD_IDS,
   ProductEntry,
   productsToEntries,
   renderMoney,
   useCurrencyConvertProducts,
 } from "./helpers";
 
+// The product grid only renders these fields, so don't fetch the
+// (potentially long) descriptions of every product.
+const PRODUCT_GRID_READ_MASK = new FieldMask({
+  paths: ["id", "name", "picture", "price"],
+});
+
 interface HomePageProps {
   userCurrency: string;
 }
 
 export const HomePage = ({ userCurrency }: HomePageProps) => {
-  const { useListProducts } = useProductCatalog({ id: CATALOG_SINGLETON_ID });
-
-  const { response } = useListProducts();
-  const products = useCurrencyConvertProducts(response?.products, userCurrency);
-  const productEntries = productsToEntries(products);
-
-  if (productEntries.length === 0)
-    return <div style={{ height: "100vh" }}></div>;
-
   return (
     <div className="App">
       <div className="local">
@@ -37,24 +35,12 @@ export const HomePage = ({ userCurrency }: HomePageProps) => {
                 <div className="col-12">
                   <h3>Hot Products</h3>
                 </div>
-                {productEntries.map((product: ProductEntry) => (
-                  <div
-                    className="col-md-4 hot-product-card"
-                    key={product.item.id}
-                  >
-                    <Link to={`/product/${product.item.id}`}>
-                      <img alt="" src={`${product.item.picture}`} />
-                      <div className="hot-product-card-img-overlay"></div>
-                    </Link>
-                    <div>
-                      <div className="hot-product-card-name">
-                        {product.item.name}
-                      </div>
-                      <div className="hot-product-card-price">
-                        {renderMoney(product.price)}
-                      </div>
-                    </div>
-                  </div>
+                {CATALOG_SHARD_IDS.map((catalogId: string) => (
+                  <HotProducts
+                    key={catalogId}
+                    catalogId={catalogId}
+                    userCurrency={userCurrency}
+                  />
                 ))}
               </div>
               <div className="row d-none d-lg-block home-desktop-footer-row">
@@ -68,3 +54,36 @@ export const HomePage = ({ userCurrency }: HomePageProps) => {
     </div>
   );
 };
+
+interface HotProductsProps {
+  catalogId: string;
+  userCurrency: string;
+}
+
+// Renders the products of one shard of the catalog.
+const HotProducts = ({ catalogId, userCurrency }: HotProductsProps) => {
+  const { useListProducts } = useProductCatalog({ id: catalogId });
+
+  const { response } = useListProducts({ readMask: PRODUCT_GRID_READ_MASK });
+  const products = useCurrencyConvertProducts(response?.products, userCurrency);
+  const productEntries = productsToEntries(products);
+
+  return (
+    <>
+      {productEntries.map((product: ProductEntry) => (
+        <div className="col-md-4 hot-product-card" key={product.item.id}>
+          <Link to={`/product/${product.item.id}`}>
+            <img alt="" src={`${product.item.picture}`} />
+            <div className="hot-product-card-img-overlay"></div>
+          </Link>
+          <div>
+            <div className="hot-product-card-name">{product.item.name}</div>
+            <div className="hot-product-card-price">
+              {renderMoney(product.price)}
+            </div>
+          </div>
+        </div>
+      ))}
+    </>
+  );
+};
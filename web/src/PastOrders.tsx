@@ -1,13 +1,9 @@
-import { PartialMessage } from "@bufbuild/protobuf";
-import type { ResponseOrAborted } from "@reboot-dev/reboot-web";
 import {
-  GetProductRequest,
   OrderResult,
   OrdersResponse,
   PlaceOrderRequest,
   Product,
 } from "./gen/boutique/v1/demo_pb";
-import { ProductCatalogGetProductAborted } from "./gen/boutique/v1/demo_rbt_react";
 import {
   ProductItem,
   multiplyMoney,
@@ -19,9 +15,7 @@ import { Link } from "react-router-dom";
 import css from "./PastOrders.module.css";
 
 interface OrdersSummaryProps {
-  getProduct: (
-    partialRequest?: PartialMessage<GetProductRequest> | undefined
-  ) => Promise<ResponseOrAborted<Product, ProductCatalogGetProductAborted>>;
+  getProduct: (id: string) => Promise<Product>;
   userCurrency: string;
   response: OrdersResponse | undefined;
   pendingPlaceOrderMutations: {
@@ -31,6 +25,7 @@ interface OrdersSummaryProps {
     error?: unknown;
     data?: any;
   }[];
+  reorder: (order: OrderResult) => void;
 }
 
 export const PastOrders = ({
@@ -38,6 +33,7 @@ export const PastOrders = ({
   userCurrency,
   pendingPlaceOrderMutations,
   response,
+  reorder,
 }: OrdersSummaryProps) => {
   const [orderDetails, setOrderDetails] = useState<{
     [id: string]: ProductItem[];
@@ -47,35 +43,27 @@ export const PastOrders = ({
     async function runEffect() {
       if (response !== undefined) {
         for (const order of response.orders) {
-          const productItems: ProductItem[] = [];
-
-          for (const orderItem of order.items) {
-            if (orderItem !== undefined && orderItem.item !== undefined) {
-              const { response: productDetails } = await getProduct({
-                id: orderItem.item.productId,
-              });
-
-              const item = orderItem.item;
-
-              if (productDetails !== undefined) {
-                productItems.push({
-                  product: productDetails,
-                  item: item,
-                });
-
-                const newOrderDetail: {
-                  [id: string]: ProductItem[];
-                } = {};
-
-                newOrderDetail[order.orderId] = productItems;
-
-                setOrderDetails((orderDetails) => ({
-                  ...orderDetails,
-                  ...newOrderDetail,
-                }));
+          // Look up all of the order's products at once; most will
+          // already be cached.
+          const productItems = await Promise.all(
+            order.items.map(async ({ item }) => {
+              if (item === undefined) return undefined;
+              try {
+                return { product: await getProduct(item.productId), item };
+              } catch (error: unknown) {
+                console.warn(error);
+                return undefined;
               }
-            }
-          }
+            })
+          );
+
+          setOrderDetails((orderDetails) => ({
+            ...orderDetails,
+            [order.orderId]: productItems.filter(
+              (productItem): productItem is ProductItem =>
+                productItem !== undefined
+            ),
+          }));
         }
       }
     }
@@ -111,7 +99,13 @@ export const PastOrders = ({
             <div key={orderResult.orderId}>
               <div className="row cart-summary-total-row order-summary-total-row">
                 <div className="col-md-10 pl-md-0">
-                  Order ID: {orderResult.orderId}
+                  Order ID: {orderResult.orderId}{" "}
+                  <button
+                    className="cymbal-button-secondary"
+                    onClick={() => reorder(orderResult)}
+                  >
+                    Reorder
+                  </button>
                 </div>
                 {orderResult.shippingCost !== undefined && (
                   <div className="col-md-2 pr-md-0 text-right">
@@ -2,7 +2,7 @@ import { useCart, useProductCatalog } from "./gen/boutique/v1/demo_rbt_react";
 import { useState } from "react";
 import { useNavigate, useParams } from "react-router-dom";
 import {
-  CATALOG_SINGLETON_ID,
+  catalogIdForProduct,
   productToEntry,
   renderMoney,
   useCurrencyConvertProducts,
@@ -20,7 +20,7 @@ export const Product = ({ cartId, userCurrency }: ProductProps) => {
 
   const { addItem } = useCart({ id: cartId });
   const { useGetProduct } = useProductCatalog({
-    id: CATALOG_SINGLETON_ID,
+    id: catalogIdForProduct(productId ?? ""),
   });
   const { response: product } = useGetProduct({ id: productId });
 
@@ -0,0 +1,64 @@
+// A client-side cache shared by every component that uses it.
+//
+// Concurrent requests for the same key are coalesced into one fetch, and
+// a value older than `maxAgeMs` is still returned straight away while it
+// is refetched in the background ("stale-while-revalidate").
+export class Cache<V> {
+  private entries = new Map<string, { value: V; fetchedAt: number }>();
+  private inFlight = new Map<string, Promise<V>>();
+
+  constructor(private maxAgeMs: number) {}
+
+  get(key: string, fetchValue: () => Promise<V>): Promise<V> {
+    return this.getMany([key], async () => [await fetchValue()]).then(
+      ([value]) => value
+    );
+  }
+
+  // Returns the values for `keys`, fetching all of those that are
+  // missing or stale, and not already being fetched, in one call to
+  // `fetchValues`, which must return their values in the same order.
+  getMany(
+    keys: string[],
+    fetchValues: (keys: string[]) => Promise<V[]>
+  ): Promise<V[]> {
+    const now = Date.now();
+    const keysToFetch = [...new Set(keys)].filter((key) => {
+      if (this.inFlight.has(key)) return false;
+      const entry = this.entries.get(key);
+      return entry === undefined || now - entry.fetchedAt > this.maxAgeMs;
+    });
+
+    if (keysToFetch.length > 0) {
+      const values = fetchValues(keysToFetch);
+      keysToFetch.forEach((key, index) => {
+        const value = values
+          .then((values) => {
+            this.entries.set(key, {
+              value: values[index],
+              fetchedAt: Date.now(),
+            });
+            return values[index];
+          })
+          .finally(() => this.inFlight.delete(key));
+        // Nobody may be waiting for a value that is being revalidated,
+        // so don't let a failure to fetch it go unhandled.
+        value.catch((error: unknown) => console.warn(error));
+        this.inFlight.set(key, value);
+      });
+    }
+
+    return Promise.all(
+      keys.map((key) => {
+        const entry = this.entries.get(key);
+        return entry !== undefined ? entry.value : this.inFlight.get(key)!;
+      })
+    );
+  }
+
+  // Forgets every value, e.g., because they were all derived from data
+  // that has changed. Fetches that are in flight are unaffected.
+  clear() {
+    this.entries.clear();
+  }
+}
@@ -1,10 +1,73 @@
-import { useEffect, useState } from "react";
-import { CartItem, Money, Product } from "./gen/boutique/v1/demo_pb";
+import { createContext, useContext, useEffect, useState } from "react";
+import {
+  CartItem,
+  Money,
+  Product,
+} from "./gen/boutique/v1/demo_pb";
+import type { UseProductCatalogApi } from "./gen/boutique/v1/demo_rbt_react";
+import { Cache } from "./cache";
 
-export const SHIPPING_SINGLETON_ID = "shipping";
-export const CHECKOUT_SINGLETON_ID = "checkout";
 export const CATALOG_SINGLETON_ID = "product-catalog";
 
+// The catalog may be partitioned by product ID across several
+// `ProductCatalog` states ("shards"). This must match
+// `PRODUCT_CATALOG_SHARDS` on the backend, and the routing below must
+// match `backend/src/productcatalog/routing.py`.
+export const CATALOG_SHARD_COUNT = Number(
+  import.meta.env.VITE_PRODUCT_CATALOG_SHARDS ?? "1"
+);
+
+export const catalogShardId = (shardIndex: number): string =>
+  // An unsharded catalog keeps its original ID.
+  CATALOG_SHARD_COUNT === 1
+    ? CATALOG_SINGLETON_ID
+    : `${CATALOG_SINGLETON_ID}-${shardIndex}`;
+
+export const CATALOG_SHARD_IDS = Array.from(
+  { length: CATALOG_SHARD_COUNT },
+  (_, shardIndex) => catalogShardId(shardIndex)
+);
+
+export const catalogIdForProduct = (productId: string): string => {
+  // 32 bit FNV-1a of the UTF-8 encoded product ID.
+  let hash = 0x811c9dc5;
+  for (const byte of new TextEncoder().encode(productId)) {
+    hash = Math.imul(hash ^ byte, 0x01000193) >>> 0;
+  }
+  return catalogShardId(hash % CATALOG_SHARD_COUNT);
+};
+
+// How long a product looked up by `useCatalogGetProduct()` is used for
+// before it is looked up again (in the background).
+const PRODUCT_MAX_AGE_MS = 5 * 60 * 1000;
+
+const products = new Cache<Product>(PRODUCT_MAX_AGE_MS);
+
+// The `getProduct` of each catalog shard, by shard ID, as provided by
+// `CatalogProvider`.
+export const CatalogShardsContext = createContext<
+  Map<string, UseProductCatalogApi["getProduct"]>
+>(new Map());
+
+// Returns a `getProduct` that looks up a product by ID in the catalog
+// shard that holds it, rejecting if that fails. Products are cached, so
+// looking up the same product again, e.g., for every past order that
+// contains it, doesn't go back to the catalog.
+export const useCatalogGetProduct = () => {
+  const shards = useContext(CatalogShardsContext);
+
+  return (id: string): Promise<Product> =>
+    products.get(id, async () => {
+      const getProduct = shards.get(catalogIdForProduct(id));
+      if (getProduct === undefined) {
+        throw new Error("Not inside a `CatalogProvider`");
+      }
+      const { response, aborted } = await getProduct({ id });
+      if (response === undefined) throw aborted;
+      return response;
+    });
+};
+
 export interface ProductItem {
   product: Product;
   item: CartItem;
@@ -15,72 +78,103 @@ export interface ProductEntry {
   price: Money | undefined;
 }
 
-export const convertedShippingCost = async (
-  cost: Money,
-  userCurrency: string
-): Promise<Money> => {
-  if (userCurrency === "USD") {
-    return cost;
-  }
+// How long converted prices and supported currencies are used for
+// before they are refetched (in the background).
+const CONVERSION_MAX_AGE_MS = 60 * 1000;
 
-  const fakeProduct = {
-    id: "noop",
-    name: "fake",
-    description: "this is the wrong api",
-    price: cost,
-  };
+// Converted prices, keyed by the amount and the currency it was
+// converted to; see `conversionKey()`.
+const convertedPrices = new Cache<Money | undefined>(CONVERSION_MAX_AGE_MS);
+
+// The version of the rates that `convertedPrices` were converted with.
+let convertedPricesRatesVersion: string | undefined = undefined;
+
+const conversionKey = (price: Money, userCurrency: string): string =>
+  `${price.currencyCode}:${price.units}:${price.nanos}:${userCurrency}`;
+
+const fetchConvertedPrices = async (
+  prices: Money[],
+  userCurrency: string
+): Promise<(Money | undefined)[]> => {
   const response = await fetch(`${import.meta.env.VITE_REBOOT_URL}/convert`, {
     method: "POST",
     body: JSON.stringify({
-      products: [fakeProduct],
+      // Only the price of each "product" is needed.
+      products: prices.map((price, index) => ({ id: `${index}`, price })),
       toCode: userCurrency,
+      pricesOnly: true,
     }),
   });
   const json = await response.json();
 
-  return json.products[0].price;
+  // Prices converted with other rates are out of date.
+  if (json.ratesVersion !== convertedPricesRatesVersion) {
+    convertedPrices.clear();
+    convertedPricesRatesVersion = json.ratesVersion;
+  }
+
+  return (json.prices ?? []).map(
+    (productPrice: { price?: Money }) => productPrice.price
+  );
 };
 
-export const useCurrencyConvertProductItems = (
-  productItems: ProductItem[] | undefined,
+// Converts the prices of `products` to `userCurrency`, returning them in
+// the same order. Prices that have been converted before are not sent
+// again, and the rest are converted in one request.
+const convertPrices = async (
+  products: { id: string; price?: Money }[],
   userCurrency: string
-) => {
-  const [convertedProductItems, setConvertedProductItems] = useState<
-    ProductItem[]
-  >([]);
+): Promise<(Money | undefined)[]> => {
+  const pricesByKey = new Map<string, Money>();
+  for (const { price } of products) {
+    if (price !== undefined) {
+      pricesByKey.set(conversionKey(price, userCurrency), price);
+    }
+  }
 
-  useEffect(() => {
-    if (productItems === undefined) return;
+  const keys = [...pricesByKey.keys()];
+  const converted = await convertedPrices.getMany(keys, (keysToFetch) =>
+    fetchConvertedPrices(
+      keysToFetch.map((key) => pricesByKey.get(key)!),
+      userCurrency
+    )
+  );
+  const convertedByKey = new Map(
+    keys.map((key, index) => [key, converted[index]])
+  );
 
-    if (userCurrency === "USD") {
-      setConvertedProductItems(productItems);
-    } else {
-      fetch(`${import.meta.env.VITE_REBOOT_URL}/convert`, {
-        method: "POST",
-        body: JSON.stringify({
-          products: productItems.map(
-            (productItem: ProductItem) => productItem.product
-          ),
-          toCode: userCurrency,
-        }),
-      })
-        .then((res) => res.json())
-        .then((json) => {
-          const convertedProductItems = json.products.map(
-            (product: Product) => ({
-              product: product,
-              item: productItems.find(
-                (productItem: ProductItem) =>
-                  productItem.item.productId === product.id
-              )?.item,
-            })
-          );
-          setConvertedProductItems(convertedProductItems);
-        });
-    }
-  }, [productItems, userCurrency]);
+  return products.map(({ price }) =>
+    price !== undefined
+      ? convertedByKey.get(conversionKey(price, userCurrency))
+      : undefined
+  );
+};
+
+const supportedCurrencies = new Cache<string[]>(CONVERSION_MAX_AGE_MS);
+
+export const getSupportedCurrencies = (): Promise<string[]> =>
+  supportedCurrencies.get("", async () => {
+    const response = await fetch(
+      `${import.meta.env.VITE_REBOOT_URL}/get_supported_currencies`
+    );
+    const json: { currencyCodes: string[] } = await response.json();
+    return json.currencyCodes;
+  });
+
+export const convertedShippingCost = async (
+  cost: Money,
+  userCurrency: string
+): Promise<Money> => {
+  if (userCurrency === "USD") {
+    return cost;
+  }
 
-  return convertedProductItems;
+  const [price] = await convertPrices(
+    [{ id: "shipping", price: cost }],
+    userCurrency
+  );
+
+  return price ?? cost;
 };
 
 export const useCurrencyConvertProducts = (
@@ -100,16 +194,14 @@ export const useCurrencyConvertProducts = (
     if (userCurrency === "USD") {
       setConvertedProducts(products);
     } else {
-      fetch(`${import.meta.env.VITE_REBOOT_URL}/convert`, {
-        method: "POST",
-        body: JSON.stringify({
-          products: products,
-          toCode: userCurrency,
-        }),
-      })
-        .then((res) => res.json())
-        .then((json) => {
-          setConvertedProducts(json.products);
+      convertPrices(products, userCurrency)
+        .then((prices) => {
+          setConvertedProducts(
+            products.map(
+              (product: Product, index: number) =>
+                ({ ...product, price: prices[index] } as Product)
+            )
+          );
         })
         .catch((e: unknown) => console.log(e));
     }
@@ -147,25 +239,23 @@ export const multiplyMoney = (money: Money | undefined, multiplier: number) => {
   });
 };
 
-export const addMoney = (moneyA: Money, moneyB: Money): Money => {
-  if (moneyA.currencyCode !== moneyB.currencyCode) {
-    // This is a bug! Fix!
-    return new Money();
-  }
-
-  const moneyAInt = Number(
-    `${moneyA.units}.${(moneyA.nanos / 1000000000).toFixed(2).split(".")[1]}`
-  );
-  const moneyBInt = Number(
-    `${moneyB.units}.${(moneyB.nanos / 1000000000).toFixed(2).split(".")[1]}`
-  );
+const NANOS_PER_UNIT = BigInt(1000000000);
 
-  const moneyInt = moneyAInt + moneyBInt;
+// Adds two amounts of money in the same currency exactly, in whole nanos,
+// rather than by way of floating point.
+export const sumMoney = (moneyA: Money, moneyB: Money): Money => {
+  const totalNanos =
+    moneyA.units * NANOS_PER_UNIT +
+    BigInt(moneyA.nanos) +
+    moneyB.units * NANOS_PER_UNIT +
+    BigInt(moneyB.nanos);
 
+  // Division and remainder both truncate towards zero, so units and
+  // nanos keep the same sign, as they must.
   return new Money({
-    units: BigInt(moneyInt.toString().split(".")[0]),
-    nanos: Number(moneyInt.toString().split(".")[1] + "0000000"),
     currencyCode: moneyA.currencyCode,
+    units: totalNanos / NANOS_PER_UNIT,
+    nanos: Number(totalNanos % NANOS_PER_UNIT),
   });
 };
 
@@ -2,6 +2,7 @@ import { RebootClientProvider } from "@reboot-dev/reboot-react";
 import ReactDOM from "react-dom/client";
 import { BrowserRouter } from "react-router-dom";
 import App from "./App";
+import { CatalogProvider } from "./CatalogProvider";
 import "./index.css";
 
 const root = ReactDOM.createRoot(
@@ -10,8 +11,10 @@ const root = ReactDOM.createRoot(
 
 root.render(
   <RebootClientProvider url={import.meta.env.VITE_REBOOT_URL}>
-    <BrowserRouter basename="/">
-      <App />
-    </BrowserRouter>
+    <CatalogProvider>
+      <BrowserRouter basename="/">
+        <App />
+      </BrowserRouter>
+    </CatalogProvider>
   </RebootClientProvider>
 );